@@ -10,12 +10,13 @@ import termios
 import threading
 import time
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
 from .common import (
     DEFAULT_POLL_INTERVAL,
+    JsonlAppender,
+    JsonlTailer,
     PigeonConfig,
-    append_jsonl,
     atomic_write_json,
     control_path,
     decode_bytes,
@@ -30,13 +31,17 @@ from .common import (
     status_path,
     stdin_path,
     stream_path,
-    tail_jsonl,
     utc_iso,
 )
 from .config import FileConfig, sync_env_to_file_config
 
 DEFAULT_WORKER_WAIT_SECONDS = 3.0
 DEFAULT_INTERACTIVE_COMMAND = "bash --noprofile --norc -i"
+# Upper bound on waiting for the worker's last stream record once the status
+# file says the session is over.
+STREAM_DRAIN_TIMEOUT_SECONDS = 2.0
+# Stream events the worker writes last, before the terminal status.
+_FINAL_STREAM_EVENTS = frozenset({"exit", "worker_error"})
 DEFAULT_INTERACTIVE_PS1 = "[pigeon][\\u@\\h \\w]\\$ "
 FORBIDDEN_ARGV_OPERATOR_TOKENS = {"|", "||", ";", "&&", "&", ">", ">>", "<", "<<", "(", ")"}
 
@@ -51,8 +56,8 @@ def _read_terminal_size() -> Optional[Dict[str, int]]:
     return {"cols": int(cols), "rows": int(rows)}
 
 
-def _resolve_request_user(file_config: FileConfig) -> str:
-    return file_config.user or os.environ.get("USER", "")
+def _resolve_request_user(file_config: FileConfig, env: Optional[Mapping[str, str]] = None) -> str:
+    return file_config.user or (os.environ if env is None else env).get("USER", "")
 
 
 def _resolve_request_route(parsed_args: argparse.Namespace, file_config: FileConfig) -> Optional[str]:
@@ -97,6 +102,7 @@ def _build_request(
     route: Optional[str],
     extra_env: Optional[Dict[str, str]] = None,
     unset_env: Optional[Sequence[str]] = None,
+    local_env: Optional[Mapping[str, str]] = None,
 ) -> Dict[str, object]:
     # Do not forward caller(gpu_m) environment into remote execution.
     # Worker(cpu_m) process environment is the base, while config remote_env
@@ -113,7 +119,7 @@ def _build_request(
         "requester": {
             "host": host_name(),
             "pid": os.getpid(),
-            "user": _resolve_request_user(file_config),
+            "user": _resolve_request_user(file_config, local_env),
         },
         "env": env,
         "terminal": {
@@ -167,18 +173,23 @@ def _shell_join_tokens(command: Sequence[str]) -> str:
     return " ".join(parts)
 
 
-def _rewrite_local_expanded_env_tokens(command: Sequence[str], file_config: FileConfig) -> List[str]:
+def _rewrite_local_expanded_env_tokens(
+    command: Sequence[str],
+    file_config: FileConfig,
+    env: Optional[Mapping[str, str]] = None,
+) -> List[str]:
     tokens = [str(x) for x in command]
     if not tokens:
         return tokens
     if not file_config.remote_env:
         return tokens
 
-    local_env = {k: v for k, v in os.environ.items() if isinstance(v, str)}
+    remote_env = dict(file_config.remote_env)
+    local_env = os.environ if env is None else env
     assignments = _prefix_assignments(tokens)
     assign_count = len(assignments)
 
-    candidates = set(file_config.remote_env.keys()) | set(assignments.keys())
+    candidates = set(remote_env) | set(assignments)
     if not candidates:
         return tokens
 
@@ -193,7 +204,7 @@ def _rewrite_local_expanded_env_tokens(command: Sequence[str], file_config: File
                 # Case: `VAR=new cmd $VAR` in caller shell where `$VAR` got
                 # expanded early to local value; use assignment RHS as expected.
                 replaced = assignments[name]
-            elif name in file_config.remote_env:
+            elif name in remote_env:
                 # Case: token came from early local expansion; restore remote ref.
                 replaced = f"${name}"
             break
@@ -205,12 +216,15 @@ def _normalize_exec_command(
     command: Sequence[str],
     file_config: FileConfig,
     command_mode: str = "argv",
+    env: Optional[Mapping[str, str]] = None,
 ) -> List[str]:
+    if env is None:
+        env = os.environ
     if command_mode == "interactive":
-        return _build_interactive_exec_command(file_config)
+        return _build_interactive_exec_command(file_config, env)
 
     shell_prefix = ["bash", "--noprofile", "--norc", "-c"]
-    prelude = _shell_prelude(file_config)
+    prelude = _shell_prelude(file_config, env)
     if command_mode == "shell_snippet":
         if len(command) != 1:
             raise RuntimeError("shell_snippet mode requires a single snippet argument")
@@ -222,11 +236,14 @@ def _normalize_exec_command(
         # A single argument can be an intentional shell snippet like:
         #   pigeon 'cd x && make'
         return [*shell_prefix, f"{prelude}{str(command[0])}"]
-    rewritten = _rewrite_local_expanded_env_tokens(command, file_config)
+    rewritten = _rewrite_local_expanded_env_tokens(command, file_config, env)
     return [*shell_prefix, f"{prelude}{_shell_join_tokens(rewritten)}"]
 
 
-def _build_interactive_exec_command(file_config: FileConfig) -> List[str]:
+def _build_interactive_exec_command(
+    file_config: FileConfig,
+    env: Optional[Mapping[str, str]] = None,
+) -> List[str]:
     raw = (file_config.interactive_command or DEFAULT_INTERACTIVE_COMMAND).strip()
     if not raw:
         raw = DEFAULT_INTERACTIVE_COMMAND
@@ -236,7 +253,7 @@ def _build_interactive_exec_command(file_config: FileConfig) -> List[str]:
         raise RuntimeError(f"invalid interactive.command: {exc}") from exc
     if not parts:
         raise RuntimeError("invalid interactive.command: empty command")
-    if not _source_bashrc_enabled(file_config):
+    if not _source_bashrc_enabled(file_config, env):
         return parts
     quoted = " ".join(shlex.quote(p) for p in parts)
     prelude = "if [ -r ~/.bashrc ]; then . ~/.bashrc >/dev/null 2>&1 || true; fi"
@@ -278,12 +295,14 @@ def _terminal_env_patch() -> tuple[Dict[str, str], List[str]]:
     return out, unset
 
 
-def _shell_prelude(file_config: FileConfig) -> str:
+def _shell_prelude(file_config: FileConfig, env: Optional[Mapping[str, str]] = None) -> str:
+    if env is None:
+        env = os.environ
     lines: List[str] = []
-    if _source_bashrc_enabled(file_config):
+    if _source_bashrc_enabled(file_config, env):
         # Optional: load cpu-side ~/.bashrc without leaking any startup output.
         lines.append("if [ -r ~/.bashrc ]; then . ~/.bashrc >/dev/null 2>&1 || true; fi")
-    if not os.environ.get("NO_COLOR") and sys.stdout.isatty():
+    if not env.get("NO_COLOR") and sys.stdout.isatty():
         # Keep shell startup clean (no user rc/profile), but preserve common
         # interactive color behavior for basic tools.
         lines.extend(
@@ -300,12 +319,14 @@ def _shell_prelude(file_config: FileConfig) -> str:
     return "\n".join(lines) + "\n"
 
 
-def _source_bashrc_enabled(file_config: FileConfig) -> bool:
+def _source_bashrc_enabled(file_config: FileConfig, env: Optional[Mapping[str, str]] = None) -> bool:
     if file_config.interactive_source_bashrc is not None:
         return bool(file_config.interactive_source_bashrc)
+    if env is None:
+        env = os.environ
     raw = (
-        os.environ.get("PIGEON_INTERACTIVE_SOURCE_BASHRC")
-        or os.environ.get("PIGEON_SOURCE_BASHRC")
+        env.get("PIGEON_INTERACTIVE_SOURCE_BASHRC")
+        or env.get("PIGEON_SOURCE_BASHRC")
         or ""
     ).strip().lower()
     return raw in {"1", "true", "yes", "on"}
@@ -336,10 +357,10 @@ def _paint_client(text: str, color_code: str, enabled: bool) -> str:
     return f"\x1b[{color_code}m{text}\x1b[0m"
 
 
-def _format_remote_env(remote_env: Dict[str, str]) -> str:
+def _format_remote_env(remote_env: Sequence[Tuple[str, str]]) -> str:
     if not remote_env:
         return "<none>"
-    pairs = [f"{k}={v}" for k, v in sorted(remote_env.items())]
+    pairs = [f"{k}={v}" for k, v in remote_env]
     return ", ".join(pairs)
 
 
@@ -505,31 +526,84 @@ class _TerminalMode:
 
 
 def _stdin_pump(config: PigeonConfig, session_id: str, stop: threading.Event) -> None:
-    in_path = stdin_path(config, session_id)
     seq = 0
     fd = sys.stdin.fileno()
-    while not stop.is_set():
-        try:
-            chunk = os.read(fd, 1024)
-        except OSError:
-            time.sleep(DEFAULT_POLL_INTERVAL)
-            continue
-        if not chunk:
-            append_jsonl(
-                in_path,
-                {"type": "stdin_eof", "seq": seq, "ts": utc_iso()},
+    with JsonlAppender(stdin_path(config, session_id)) as in_file:
+        while not stop.is_set():
+            try:
+                chunk = os.read(fd, 1024)
+            except OSError:
+                time.sleep(DEFAULT_POLL_INTERVAL)
+                continue
+            if not chunk:
+                in_file.append({"type": "stdin_eof", "seq": seq, "ts": utc_iso()})
+                break
+            in_file.append(
+                {
+                    "type": "stdin",
+                    "seq": seq,
+                    "ts": utc_iso(),
+                    "data_b64": encode_bytes(chunk),
+                },
             )
+            seq += 1
+
+
+def _has_final_event(records: Iterable[Dict[str, object]]) -> bool:
+    return any(rec.get("type") == "event" and rec.get("event") in _FINAL_STREAM_EVENTS for rec in records)
+
+
+def _drain_stream(stream_tail: JsonlTailer, timeout: float) -> Optional[int]:
+    """Copies stream records until the worker's final event or ``timeout``;
+    returns the exit code from an exit event, if one was read.
+
+    The worker writes its last stream record before the terminal status, but
+    the stream can still lag the status file (e.g. over NFS).
+    """
+    deadline = now_ts() + timeout
+    exit_code: Optional[int] = None
+    while now_ts() < deadline:
+        time.sleep(DEFAULT_POLL_INTERVAL)
+        records = stream_tail.poll()
+        event_code = _write_output_records(records)
+        if event_code is not None:
+            exit_code = event_code
+        if records and _has_final_event(records):
             break
-        append_jsonl(
-            in_path,
-            {
-                "type": "stdin",
-                "seq": seq,
-                "ts": utc_iso(),
-                "data_b64": encode_bytes(chunk),
-            },
-        )
-        seq += 1
+    return exit_code
+
+
+def _write_output_records(records: Iterable[Dict[str, object]]) -> Optional[int]:
+    """Copies stream records to stdout/stderr; returns the exit code from an
+    exit event, or None.
+
+    Consecutive output chunks for the same channel go out in one write+flush
+    instead of one per record.
+    """
+    exit_code: Optional[int] = None
+    target = None
+    pending: List[bytes] = []
+    for rec in records:
+        typ = rec.get("type")
+        if typ == "output":
+            data = rec.get("data_b64")
+            if not isinstance(data, str):
+                continue
+            out = sys.stderr.buffer if rec.get("channel") == "stderr" else sys.stdout.buffer
+            if out is not target and pending:
+                target.write(b"".join(pending))
+                target.flush()
+                pending = []
+            target = out
+            pending.append(decode_bytes(data))
+        elif typ == "event" and rec.get("event") == "exit":
+            maybe_code = rec.get("exit_code")
+            if isinstance(maybe_code, int):
+                exit_code = maybe_code
+    if pending:
+        target.write(b"".join(pending))
+        target.flush()
+    return exit_code
 
 
 def run_command(command: List[str], parsed_args: argparse.Namespace, command_mode: str = "argv") -> int:
@@ -621,19 +695,18 @@ def run_command(command: List[str], parsed_args: argparse.Namespace, command_mod
     stdin_path(config, session_id).touch(exist_ok=True)
     control_path(config, session_id).touch(exist_ok=True)
 
-    terminal_mode = _TerminalMode()
-    terminal_mode.enter()
+    control_seq = {"value": 0}
+    # One O_APPEND fd for the whole session; each signal/resize is one write().
+    # Opened before raw mode so a failure here leaves the terminal untouched;
+    # everything after it runs under the try below, which closes it.
+    control_out = JsonlAppender(control_path(config, session_id)).open()
 
+    terminal_mode = _TerminalMode()
     stop = threading.Event()
     stdin_thread = threading.Thread(target=_stdin_pump, args=(config, session_id, stop), daemon=True)
-    if sys.stdin and hasattr(sys.stdin, "fileno"):
-        stdin_thread.start()
-
-    control_seq = {"value": 0}
 
     def _on_sigint(signum, frame) -> None:
-        append_jsonl(
-            control_path(config, session_id),
+        control_out.append(
             {
                 "type": "signal",
                 "seq": control_seq["value"],
@@ -647,8 +720,7 @@ def run_command(command: List[str], parsed_args: argparse.Namespace, command_mod
         size = _read_terminal_size()
         if not size:
             return
-        append_jsonl(
-            control_path(config, session_id),
+        control_out.append(
             {
                 "type": "resize",
                 "seq": control_seq["value"],
@@ -661,34 +733,31 @@ def run_command(command: List[str], parsed_args: argparse.Namespace, command_mod
 
     old_sigint = signal.getsignal(signal.SIGINT)
     old_sigwinch = signal.getsignal(signal.SIGWINCH)
-    signal.signal(signal.SIGINT, _on_sigint)
-    signal.signal(signal.SIGWINCH, _on_sigwinch)
 
-    stream_offset = 0
+    # Each poll preads only new bytes; see JsonlTailer for when the fd is kept.
+    stream_tail = JsonlTailer(stream_path(config, session_id))
+    # Built once as a plain string; the loop below re-reads it every tick.
+    status_file = os.fspath(status_path(config, session_id))
     last_state = "pending"
     exit_code = 1
     pending_deadline = now_ts() + max(wait_timeout, 0.0)
+    stream_done = False
     try:
+        terminal_mode.enter()
+        if sys.stdin and hasattr(sys.stdin, "fileno"):
+            stdin_thread.start()
+        signal.signal(signal.SIGINT, _on_sigint)
+        signal.signal(signal.SIGWINCH, _on_sigwinch)
+
         while True:
-            stream_offset, records = tail_jsonl(stream_path(config, session_id), stream_offset)
-            for rec in records:
-                if rec.get("type") == "output":
-                    data = rec.get("data_b64")
-                    if isinstance(data, str):
-                        out = decode_bytes(data)
-                        channel = rec.get("channel")
-                        if channel == "stderr":
-                            sys.stderr.buffer.write(out)
-                            sys.stderr.buffer.flush()
-                        else:
-                            sys.stdout.buffer.write(out)
-                            sys.stdout.buffer.flush()
-                elif rec.get("type") == "event" and rec.get("event") == "exit":
-                    maybe_code = rec.get("exit_code")
-                    if isinstance(maybe_code, int):
-                        exit_code = maybe_code
-
-            status = read_json(status_path(config, session_id))
+            records = stream_tail.poll()
+            event_code = _write_output_records(records)
+            if event_code is not None:
+                exit_code = event_code
+            if records and not stream_done:
+                stream_done = _has_final_event(records)
+
+            status = read_json(status_file)
             state = status.get("state", "unknown")
             maybe_code = status.get("exit_code")
             if isinstance(maybe_code, int):
@@ -714,25 +783,10 @@ def run_command(command: List[str], parsed_args: argparse.Namespace, command_mod
                     return 4
 
             if state in {"succeeded", "failed", "cancelled"}:
-                for _ in range(3):
-                    time.sleep(DEFAULT_POLL_INTERVAL)
-                    stream_offset, records = tail_jsonl(stream_path(config, session_id), stream_offset)
-                    drained = False
-                    for rec in records:
-                        drained = True
-                        if rec.get("type") == "output":
-                            data = rec.get("data_b64")
-                            if isinstance(data, str):
-                                out = decode_bytes(data)
-                                channel = rec.get("channel")
-                                if channel == "stderr":
-                                    sys.stderr.buffer.write(out)
-                                    sys.stderr.buffer.flush()
-                                else:
-                                    sys.stdout.buffer.write(out)
-                                    sys.stdout.buffer.flush()
-                    if not drained:
-                        break
+                if not stream_done:
+                    event_code = _drain_stream(stream_tail, STREAM_DRAIN_TIMEOUT_SECONDS)
+                    if event_code is not None:
+                        exit_code = event_code
                 break
 
             time.sleep(DEFAULT_POLL_INTERVAL)
@@ -741,4 +795,6 @@ def run_command(command: List[str], parsed_args: argparse.Namespace, command_mod
         terminal_mode.exit()
         signal.signal(signal.SIGINT, old_sigint)
         signal.signal(signal.SIGWINCH, old_sigwinch)
+        control_out.close()
+        stream_tail.close()
     return exit_code
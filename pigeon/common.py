@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-import base64
+import binascii
 import fcntl
+import functools
 import hashlib
 import json
 import os
@@ -12,14 +13,28 @@ import time
 import uuid
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterator, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from .config import FileConfig
 
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used when orjson is absent
+    orjson = None
+
+try:
+    import pybase64
+except ImportError:  # optional: binascii is used when pybase64 is absent
+    pybase64 = None
+
 DEFAULT_POLL_INTERVAL = 0.01
 WORKER_HEARTBEAT_STALE_SECONDS = 3.0
 WORKER_HEARTBEAT_INTERVAL_SECONDS = 1.0
 APPEND_FSYNC_ENV = "PIGEON_APPEND_FSYNC"
+TAIL_KEEP_OPEN_ENV = "PIGEON_TAIL_KEEP_OPEN"
+# Smallest pread a JsonlTailer poll issues, so bytes appended after its
+# fstat() are still picked up by the same poll.
+_TAIL_READ_MIN = 64 * 1024
 _WORKER_ID_SAFE_RE = re.compile(r"[^A-Za-z0-9_.-]")
 
 
@@ -44,19 +59,22 @@ class PigeonConfig:
         )
         return cls(cache_root=Path(cache).expanduser().resolve(), namespace=ns)
 
-    @property
+    # Derived once per instance: the worker resolves these on every poll tick
+    # and for every session path. cached_property writes straight into the
+    # instance __dict__, so it works on the frozen dataclass.
+    @functools.cached_property
     def ns_root(self) -> Path:
         return self.cache_root / "namespaces" / self.namespace
 
-    @property
+    @functools.cached_property
     def sessions_dir(self) -> Path:
         return self.ns_root / "sessions"
 
-    @property
+    @functools.cached_property
     def locks_dir(self) -> Path:
         return self.ns_root / "locks"
 
-    @property
+    @functools.cached_property
     def workers_dir(self) -> Path:
         return self.ns_root / "workers"
 
@@ -70,10 +88,21 @@ def now_ts() -> float:
     return time.time()
 
 
+# (whole second, its "%Y-%m-%dT%H:%M:%S" text); swapped as one tuple so
+# concurrent session threads never see a mismatched pair.
+_UTC_ISO_SECOND: Tuple[int, str] = (-1, "")
+
+
 def utc_iso(ts: Optional[float] = None) -> str:
+    global _UTC_ISO_SECOND
     if ts is None:
         ts = now_ts()
-    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts)) + f".{int((ts % 1) * 1_000_000):06d}Z"
+    sec = int(ts // 1)
+    cached_sec, prefix = _UTC_ISO_SECOND
+    if sec != cached_sec:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+        _UTC_ISO_SECOND = (sec, prefix)
+    return f"{prefix}.{int((ts % 1) * 1_000_000):06d}Z"
 
 
 def new_session_id() -> str:
@@ -85,17 +114,12 @@ def host_name() -> str:
 
 
 def normalize_route(value: object) -> Optional[str]:
-    if value is None:
-        return None
-    if not isinstance(value, str):
-        return None
-    route = value.strip()
-    return route or None
+    # Routes come from JSON/TOML/argv, which only produce exact str.
+    return (value.strip() or None) if type(value) is str else None
 
 
 def route_matches(worker_route: Optional[str], req_route: Optional[str]) -> bool:
-    if req_route is None:
-        return worker_route is None
+    # Both sides are normalized, so None (default route) only matches None.
     return worker_route == req_route
 
 
@@ -153,7 +177,9 @@ def write_worker_heartbeat(
         "updated_ts": ts,
     }
     path = worker_heartbeat_path(config, worker_id)
-    atomic_write_json(path, payload)
+    # Rewritten every interval and meaningless once the worker is gone, so a
+    # heartbeat lost in a host crash needs no fsync.
+    atomic_write_json(path, payload, durable=False)
     return path
 
 
@@ -176,14 +202,18 @@ def discover_active_workers(
         stale_after = WORKER_HEARTBEAT_STALE_SECONDS
     base_now = now_ts() if now is None else float(now)
     out: List[Dict[str, Any]] = []
-    if not config.workers_dir.exists():
+    base = str(config.workers_dir)
+    try:
+        with os.scandir(base) as it:
+            # is_file() is answered from d_type without a stat per entry, and
+            # in-flight ".tmp-*" files from atomic_write_json fail the suffix test.
+            names = sorted(e.name for e in it if e.name.endswith(".json") and e.is_file())
+    except FileNotFoundError:
         return out
     route = normalize_route(req_route)
-    for entry in sorted(config.workers_dir.iterdir()):
-        if not entry.is_file():
-            continue
+    for name in names:
         try:
-            rec = read_json(entry)
+            rec = read_json(os.path.join(base, name))
         except Exception:
             continue
         worker_route = normalize_route(rec.get("route"))
@@ -202,32 +232,71 @@ def cwd_lock_path(config: PigeonConfig, cwd: str) -> Path:
     return config.locks_dir / f"{digest}.lock"
 
 
-def atomic_write_json(path: Path, data: Dict[str, Any]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    payload = json.dumps(data, ensure_ascii=True, separators=(",", ":"), sort_keys=True)
-    fd, tmp_name = tempfile.mkstemp(prefix=".tmp-", dir=str(path.parent))
+if orjson is not None:
+
+    def _dumps(data: Dict[str, Any]) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+
+    def _dumps_line(data: Dict[str, Any]) -> bytes:
+        # The encoder appends the newline itself; no concat copy per record.
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+
+    _loads = orjson.loads
+else:
+
+    def _dumps(data: Dict[str, Any]) -> bytes:
+        return json.dumps(data, ensure_ascii=True, separators=(",", ":"), sort_keys=True).encode("ascii")
+
+    def _dumps_line(data: Dict[str, Any]) -> bytes:
+        return (json.dumps(data, ensure_ascii=True, separators=(",", ":"), sort_keys=True) + "\n").encode("ascii")
+
+    _loads = json.loads
+
+
+def atomic_write_json(path: Path, data: Dict[str, Any], *, durable: bool = True) -> None:
+    """Replace ``path`` with ``data`` via temp file + rename.
+
+    Readers always see the old or the new document. ``durable=False`` skips
+    the fsync for records that are fine to lose in a host crash.
+    """
+    payload = _dumps(data)
+    parent = str(path.parent)
+    try:
+        fd, tmp_name = tempfile.mkstemp(prefix=".tmp-", dir=parent)
+    except FileNotFoundError:
+        # The parent nearly always exists (heartbeats, status rewrites), so
+        # only pay for mkdir when the temp file cannot be created.
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".tmp-", dir=parent)
     try:
-        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+        with os.fdopen(fd, "wb") as tmp:
             tmp.write(payload)
-            tmp.flush()
-            os.fsync(tmp.fileno())
+            if durable:
+                tmp.flush()
+                os.fsync(tmp.fileno())
         os.replace(tmp_name, path)
-    finally:
-        if os.path.exists(tmp_name):
+    except BaseException:
+        try:
             os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
 
 
-def read_json(path: Path) -> Dict[str, Any]:
-    with path.open("r", encoding="utf-8") as fh:
-        return json.load(fh)
+def read_json(path: Union[str, Path]) -> Dict[str, Any]:
+    with open(path, "rb") as fh:
+        return _loads(fh.read())
 
 
 def append_jsonl(path: Path, record: Dict[str, Any]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    line = json.dumps(record, ensure_ascii=True, separators=(",", ":"), sort_keys=True)
-    with path.open("a", encoding="utf-8") as fh:
+    line = _dumps_line(record)
+    try:
+        fh = path.open("ab")
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fh = path.open("ab")
+    with fh:
         fh.write(line)
-        fh.write("\n")
         if _append_fsync_enabled():
             fh.flush()
             os.fsync(fh.fileno())
@@ -240,44 +309,52 @@ def _append_fsync_enabled() -> bool:
     return False
 
 
-def tail_jsonl(path: Path, offset: int) -> Tuple[int, Iterator[Dict[str, Any]]]:
-    if not path.exists():
-        return offset, iter(())
-    size = path.stat().st_size
-    if offset > size:
-        offset = 0
-    with path.open("r", encoding="utf-8") as fh:
-        fh.seek(offset)
-        data = fh.read()
-    if not data:
-        return offset, iter(())
-
-    # Only parse full lines. Keep a trailing partial JSON line unread to avoid
-    # dropping records when reader races with writer appends.
-    last_newline = data.rfind("\n")
+def _tail_keep_open_enabled() -> bool:
+    raw = os.environ.get(TAIL_KEEP_OPEN_ENV, "").strip().lower()
+    return raw in {"1", "true", "yes", "on"}
+
+
+def split_jsonl(data: bytes) -> Tuple[int, List[Dict[str, Any]]]:
+    """Decode the complete lines of ``data``; returns (bytes consumed, records).
+
+    A trailing partial line is left unconsumed so a reader racing a writer's
+    append never drops it. Lines that fail to decode are skipped.
+    """
+    last_newline = data.rfind(b"\n")
     if last_newline < 0:
-        return offset, iter(())
-    parseable = data[: last_newline + 1]
-    new_offset = offset + len(parseable)
-
-    def _iter() -> Iterator[Dict[str, Any]]:
-        for line in parseable.splitlines():
-            if not line:
-                continue
-            try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
-                continue
+        return 0, []
+    # Split the whole buffer instead of slicing off the complete prefix first:
+    # that saves one copy of the prefix, but split() still copies every line
+    # into its own bytes object. The final piece is the unconsumed tail (empty
+    # when data ends in "\n").
+    lines = data.split(b"\n")
+    lines.pop()
+    out: List[Dict[str, Any]] = []
+    for line in lines:
+        if not line:
+            continue
+        try:
+            out.append(_loads(line))
+        except ValueError:
+            continue
+    return last_newline + 1, out
 
-    return new_offset, _iter()
 
+if pybase64 is not None:
 
-def encode_bytes(data: bytes) -> str:
-    return base64.b64encode(data).decode("ascii")
+    def encode_bytes(data: Union[bytes, bytearray, memoryview]) -> str:
+        return pybase64.b64encode(data).decode("ascii")
 
+    def decode_bytes(raw: str) -> bytes:
+        return pybase64.b64decode(raw)
+else:
 
-def decode_bytes(raw: str) -> bytes:
-    return base64.b64decode(raw.encode("ascii"))
+    def encode_bytes(data: Union[bytes, bytearray, memoryview]) -> str:
+        # binascii directly: skips the base64 module's Python-level wrapper.
+        return binascii.b2a_base64(data, newline=False).decode("ascii")
+
+    def decode_bytes(raw: str) -> bytes:
+        return binascii.a2b_base64(raw)
 
 
 class FileLock:
@@ -297,3 +374,122 @@ class FileLock:
         fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
         self._fh.close()
         self._fh = None
+
+
+class JsonlAppender:
+    """Keeps one O_APPEND fd open for a JSONL file written many times.
+
+    Each record goes out in a single write(), so concurrent appenders never
+    interleave partial lines.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._fsync = False
+
+    def open(self) -> "JsonlAppender":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | os.O_CLOEXEC, 0o644)
+        self._fsync = _append_fsync_enabled()
+        return self
+
+    def __enter__(self) -> "JsonlAppender":
+        return self.open()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        if self._fd is None:
+            raise RuntimeError(f"appender for {self.path} is not open")
+        view = memoryview(_dumps_line(record))
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        if self._fsync:
+            os.fsync(self._fd)
+
+    def close(self) -> None:
+        if self._fd is None:
+            return
+        os.close(self._fd)
+        self._fd = None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class JsonlTailer:
+    """Follows a JSONL file, returning the complete records appended since the
+    last poll.
+
+    By default every poll opens the file afresh: on NFS, open() is what
+    revalidates the client's cached attributes and pages (close-to-open
+    consistency), so a fd held across polls can keep reporting a stale size
+    for seconds. When the shared directory is known to be local,
+    PIGEON_TAIL_KEEP_OPEN keeps one fd for the tailer's lifetime instead, and
+    an idle poll is then a single fstat().
+    Reads run until EOF rather than stopping at the fstat() size, and a
+    trailing partial line is held back until its newline arrives. The file
+    may not exist yet.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = path
+        self.offset = 0
+        self._resid = b""
+        self._fd: Optional[int] = None
+        self._keep_open = _tail_keep_open_enabled()
+
+    def __enter__(self) -> "JsonlTailer":
+        return self
+
+    def poll(self) -> List[Dict[str, Any]]:
+        fd = self._fd
+        if fd is None:
+            try:
+                fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+            except FileNotFoundError:
+                return []
+            if self._keep_open:
+                self._fd = fd
+        try:
+            size = os.fstat(fd).st_size
+            pos = self.offset + len(self._resid)
+            if size < pos:
+                # Truncated underneath us: start over.
+                self.offset = 0
+                self._resid = b""
+                pos = 0
+            if self._fd is not None and size == pos:
+                # Kept-open fd on a local directory: fstat() is current there,
+                # so an idle poll settles without a read.
+                return []
+            chunks = []
+            while True:
+                want = max(size - pos, _TAIL_READ_MIN)
+                data = os.pread(fd, want, pos)
+                if data:
+                    chunks.append(data)
+                    pos += len(data)
+                if len(data) < want:
+                    break
+        finally:
+            if self._fd is None:
+                os.close(fd)
+        if not chunks:
+            return []
+        if self._resid:
+            chunks.insert(0, self._resid)
+        buf = b"".join(chunks) if len(chunks) > 1 else chunks[0]
+        consumed, out = split_jsonl(buf)
+        self._resid = buf[consumed:]
+        self.offset += consumed
+        return out
+
+    def close(self) -> None:
+        if self._fd is None:
+            return
+        os.close(self._fd)
+        self._fd = None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
+import errno
 import json
 import os
 import re
 import tempfile
-import tomllib
 from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Optional, Tuple, Union
 
 ACTIVE_CONFIG_ENV = "PIGEON_CONFIG"
 CONFIG_ROOT_ENV = "PIGEON_CONFIG_ROOT"
@@ -20,7 +20,10 @@ DEFAULT_BOOTSTRAP_WORKER_DEBUG = False
 DEFAULT_BOOTSTRAP_INTERACTIVE_COMMAND = "bash --noprofile --norc -i"
 DEFAULT_BOOTSTRAP_INTERACTIVE_SOURCE_BASHRC = False
 
-_ENV_KEY_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_REMOTE_ENV_PREFIX = "remote_env."
+_REMOTE_ENV_KEY_RE = re.compile(r"^remote_env\.\s*([A-Za-z_][A-Za-z0-9_]*)$")
+
+_MISSING_PATH_ERRNOS = frozenset({errno.ENOENT, errno.ENOTDIR, errno.EBADF, errno.ELOOP})
 
 _BOOL_TRUE = {"1", "true", "yes", "on"}
 _BOOL_FALSE = {"0", "false", "no", "off"}
@@ -53,18 +56,42 @@ class FileConfig:
     worker_route: Optional[str]
     interactive_command: Optional[str]
     interactive_source_bashrc: Optional[bool]
-    remote_env: Dict[str, str]
+    # Sorted (name, value) pairs; a tuple keeps the frozen config immutable.
+    remote_env: Tuple[Tuple[str, str], ...]
+
+
+# Every setting unset; configs for missing files are derived from it.
+_EMPTY_FILE_CONFIG = FileConfig(
+    path=None,
+    cache=None,
+    namespace=None,
+    route=None,
+    user=None,
+    worker_max_jobs=None,
+    worker_poll_interval=None,
+    worker_debug=None,
+    worker_route=None,
+    interactive_command=None,
+    interactive_source_bashrc=None,
+    remote_env=(),
+)
 
 
 def configurable_keys() -> tuple[str, ...]:
     return _CONFIG_KEYS
 
 
+def _abs_path(raw: Union[str, Path]) -> Path:
+    # Lexical normalization only: Path.resolve() lstat()s every component,
+    # which is slow on NFS homes and buys nothing for config file selection.
+    return Path(os.path.abspath(os.path.expanduser(raw)))
+
+
 def config_root_dir() -> Path:
     raw = os.environ.get(CONFIG_ROOT_ENV)
     if raw:
-        return Path(raw).expanduser().resolve()
-    return (Path.home() / ".config" / "pigeon").resolve()
+        return _abs_path(raw)
+    return _abs_path(Path.home() / ".config" / "pigeon")
 
 
 def _home_default_path() -> Path:
@@ -85,18 +112,25 @@ def get_active_config_path() -> Optional[Path]:
         return None
     if not raw:
         return None
-    return Path(raw).expanduser().resolve()
+    return _abs_path(raw)
 
 
 def set_active_config_path(path: Path) -> Path:
     pointer = active_config_pointer_path()
+    target = _abs_path(path)
+    payload = f"{target}\n"
+    try:
+        # Re-selecting the current config is common in scripts; skip the
+        # temp-file + fsync + rename round trip when nothing would change.
+        if pointer.read_text(encoding="utf-8") == payload:
+            return target
+    except OSError:
+        pass
     pointer.parent.mkdir(parents=True, exist_ok=True)
-    target = path.expanduser().resolve()
     fd, tmp_name = tempfile.mkstemp(prefix=".tmp-", dir=str(pointer.parent))
     try:
         with os.fdopen(fd, "w", encoding="utf-8") as tmp:
-            tmp.write(str(target))
-            tmp.write("\n")
+            tmp.write(payload)
             tmp.flush()
             os.fsync(tmp.fileno())
         os.replace(tmp_name, pointer)
@@ -106,10 +140,42 @@ def set_active_config_path(path: Path) -> Path:
     return target
 
 
+# (env snapshot, pointer path, pointer stamp, resolved default path)
+_DEFAULT_PATH_CACHE: Optional[
+    Tuple[Tuple[Optional[str], ...], Path, Optional[Tuple[int, int, int]], Path]
+] = None
+
+
+def _pointer_stamp(pointer: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(pointer)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
 def default_config_path() -> Path:
+    # The worker resolves this every tick; skip the realpath calls and pointer
+    # read while the selecting env vars and the pointer file are unchanged.
+    global _DEFAULT_PATH_CACHE
+    env_key = (
+        os.environ.get(ACTIVE_CONFIG_ENV),
+        os.environ.get(CONFIG_ROOT_ENV),
+        os.environ.get("HOME"),
+    )
+    cached = _DEFAULT_PATH_CACHE
+    if cached is not None and cached[0] == env_key and cached[2] == _pointer_stamp(cached[1]):
+        return cached[3]
+    path = _resolve_default_config_path()
+    pointer = active_config_pointer_path()
+    _DEFAULT_PATH_CACHE = (env_key, pointer, _pointer_stamp(pointer), path)
+    return path
+
+
+def _resolve_default_config_path() -> Path:
     by_env = os.environ.get(ACTIVE_CONFIG_ENV)
     if by_env:
-        path = Path(by_env).expanduser().resolve()
+        path = _abs_path(by_env)
         # Keep env-based selection and persisted active path aligned.
         current = get_active_config_path()
         if current != path:
@@ -121,12 +187,12 @@ def default_config_path() -> Path:
     active = get_active_config_path()
     if active is not None:
         return active
-    return _home_default_path().expanduser().resolve()
+    return _home_default_path()
 
 
 def config_target_path(explicit: Optional[str]) -> Path:
     if explicit:
-        return Path(explicit).expanduser().resolve()
+        return _abs_path(explicit)
     return default_config_path()
 
 
@@ -137,21 +203,8 @@ def discover_config_path(explicit: Optional[str]) -> Optional[Path]:
     return None
 
 
-def _empty_file_config(path: Optional[Path]) -> FileConfig:
-    return FileConfig(
-        path=path,
-        cache=None,
-        namespace=None,
-        route=None,
-        user=None,
-        worker_max_jobs=None,
-        worker_poll_interval=None,
-        worker_debug=None,
-        worker_route=None,
-        interactive_command=None,
-        interactive_source_bashrc=None,
-        remote_env={},
-    )
+def _empty_file_config(path: Path) -> FileConfig:
+    return replace(_EMPTY_FILE_CONFIG, path=path)
 
 
 def _bootstrap_file_config(path: Path) -> FileConfig:
@@ -188,23 +241,30 @@ def _bootstrap_file_config(path: Path) -> FileConfig:
         worker_route=worker_route,
         interactive_command=interactive_command,
         interactive_source_bashrc=interactive_source_bashrc,
-        remote_env={},
+        remote_env=(),
     )
 
 
 def _ensure_str(value: Any, field: str, path: Path) -> str:
+    # tomllib yields exact builtin types, so the identity check is the hot path.
+    if type(value) is str:
+        return value
     if not isinstance(value, str):
         raise RuntimeError(f"{path}: '{field}' must be string")
     return value
 
 
 def _ensure_int(value: Any, field: str, path: Path) -> int:
+    if type(value) is int:
+        return value
     if not isinstance(value, int):
         raise RuntimeError(f"{path}: '{field}' must be integer")
     return int(value)
 
 
 def _ensure_float(value: Any, field: str, path: Path) -> float:
+    if type(value) is float:
+        return value
     if isinstance(value, int):
         return float(value)
     if not isinstance(value, float):
@@ -213,108 +273,148 @@ def _ensure_float(value: Any, field: str, path: Path) -> float:
 
 
 def _ensure_bool(value: Any, field: str, path: Path) -> bool:
+    if type(value) is bool:
+        return value
     if not isinstance(value, bool):
         raise RuntimeError(f"{path}: '{field}' must be boolean")
     return bool(value)
 
 
+# (section, ((toml key, FileConfig attribute, exact type, validator), ...));
+# section None means top-level keys. Values of the exact type skip the
+# validator call; anything else goes through it for coercion or the error.
+_SECTION_FIELDS = (
+    (
+        None,
+        (
+            ("cache", "cache", str, _ensure_str),
+            ("namespace", "namespace", str, _ensure_str),
+            ("route", "route", str, _ensure_str),
+            ("user", "user", str, _ensure_str),
+        ),
+    ),
+    (
+        "worker",
+        (
+            ("max_jobs", "worker_max_jobs", int, _ensure_int),
+            ("poll_interval", "worker_poll_interval", float, _ensure_float),
+            ("debug", "worker_debug", bool, _ensure_bool),
+            ("route", "worker_route", str, _ensure_str),
+        ),
+    ),
+    (
+        "interactive",
+        (
+            ("command", "interactive_command", str, _ensure_str),
+            ("source_bashrc", "interactive_source_bashrc", bool, _ensure_bool),
+        ),
+    ),
+)
+_PARSED_ATTRS = tuple(field[1] for _, fields in _SECTION_FIELDS for field in fields)
+_POSITIVE_FIELDS = frozenset({"worker.max_jobs", "worker.poll_interval"})
+
+
+_PARSE_CACHE: Dict[Path, Tuple[Tuple[int, int, int], FileConfig]] = {}
+
+
 def _parse_config(path: Path) -> FileConfig:
     try:
-        with path.open("rb") as fh:
-            raw = tomllib.load(fh)
+        data = path.read_bytes()
     except FileNotFoundError:
         raise RuntimeError(f"config file not found: {path}") from None
-    except tomllib.TOMLDecodeError as exc:
+    return _parse_config_bytes(data, path)
+
+
+def _parse_config_bytes(data: bytes, path: Path) -> FileConfig:
+    # `path` is only recorded on the result and used in error messages.
+    # tomllib costs a few ms to import; only pay it when a file is parsed.
+    import tomllib
+
+    try:
+        raw = tomllib.loads(data.decode("utf-8"))
+    except (tomllib.TOMLDecodeError, UnicodeDecodeError) as exc:
         raise RuntimeError(f"{path}: invalid TOML: {exc}") from exc
 
     if not isinstance(raw, dict):
         raise RuntimeError(f"{path}: top-level config must be table")
 
-    cache: Optional[str] = None
-    namespace: Optional[str] = None
-    route: Optional[str] = None
-    user: Optional[str] = None
-    worker_max_jobs: Optional[int] = None
-    worker_poll_interval: Optional[float] = None
-    worker_debug: Optional[bool] = None
-    worker_route: Optional[str] = None
-    interactive_command: Optional[str] = None
-    interactive_source_bashrc: Optional[bool] = None
+    values: Dict[str, Any] = dict.fromkeys(_PARSED_ATTRS)
     remote_env: Dict[str, str] = {}
 
-    if "cache" in raw:
-        cache = _ensure_str(raw["cache"], "cache", path)
-    if "namespace" in raw:
-        namespace = _ensure_str(raw["namespace"], "namespace", path)
-    if "route" in raw:
-        route = _ensure_str(raw["route"], "route", path)
-    if "user" in raw:
-        user = _ensure_str(raw["user"], "user", path)
-
-    worker = raw.get("worker")
-    if worker is not None:
-        if not isinstance(worker, dict):
-            raise RuntimeError(f"{path}: 'worker' must be table")
-        if "max_jobs" in worker:
-            worker_max_jobs = _ensure_int(worker["max_jobs"], "worker.max_jobs", path)
-            if worker_max_jobs <= 0:
-                raise RuntimeError(f"{path}: 'worker.max_jobs' must be > 0")
-        if "poll_interval" in worker:
-            worker_poll_interval = _ensure_float(worker["poll_interval"], "worker.poll_interval", path)
-            if worker_poll_interval <= 0:
-                raise RuntimeError(f"{path}: 'worker.poll_interval' must be > 0")
-        if "debug" in worker:
-            worker_debug = _ensure_bool(worker["debug"], "worker.debug", path)
-        if "route" in worker:
-            worker_route = _ensure_str(worker["route"], "worker.route", path)
-
-    interactive = raw.get("interactive")
-    if interactive is not None:
-        if not isinstance(interactive, dict):
-            raise RuntimeError(f"{path}: 'interactive' must be table")
-        if "command" in interactive:
-            interactive_command = _ensure_str(interactive["command"], "interactive.command", path)
-        if "source_bashrc" in interactive:
-            interactive_source_bashrc = _ensure_bool(
-                interactive["source_bashrc"], "interactive.source_bashrc", path
-            )
+    for section, fields in _SECTION_FIELDS:
+        if section is None:
+            table = raw
+        else:
+            table = raw.get(section)
+            if table is None:
+                continue
+            if not isinstance(table, dict):
+                raise RuntimeError(f"{path}: '{section}' must be table")
+        for key, attr, expected, check in fields:
+            value = table.get(key)
+            if value is None:
+                continue
+            label = key if section is None else f"{section}.{key}"
+            if type(value) is not expected:
+                value = check(value, label, path)
+            if label in _POSITIVE_FIELDS and value <= 0:
+                raise RuntimeError(f"{path}: '{label}' must be > 0")
+            values[attr] = value
 
     r_env = raw.get("remote_env")
     if r_env is not None:
         if not isinstance(r_env, dict):
             raise RuntimeError(f"{path}: 'remote_env' must be table")
-        for k, v in r_env.items():
-            key = _ensure_str(k, "remote_env key", path)
-            val = _ensure_str(v, f"remote_env.{key}", path)
+        for key, val in r_env.items():
+            # tomllib keys are always str; only values need checking.
+            if type(val) is not str:
+                val = _ensure_str(val, f"remote_env.{key}", path)
             remote_env[key] = val
 
-    return FileConfig(
-        path=path,
-        cache=cache,
-        namespace=namespace,
-        route=route,
-        user=user,
-        worker_max_jobs=worker_max_jobs,
-        worker_poll_interval=worker_poll_interval,
-        worker_debug=worker_debug,
-        worker_route=worker_route,
-        interactive_command=interactive_command,
-        interactive_source_bashrc=interactive_source_bashrc,
-        remote_env=remote_env,
-    )
+    return FileConfig(path=path, remote_env=tuple(sorted(remote_env.items())), **values)
+
+
+def _load_cached(target: Path) -> Optional[FileConfig]:
+    try:
+        st = os.stat(target)
+    except OSError as exc:
+        # Same errors Path.exists() reports as "missing"; anything else
+        # (e.g. EACCES) still raises.
+        if exc.errno not in _MISSING_PATH_ERRNOS:
+            raise
+        _PARSE_CACHE.pop(target, None)
+        return None
+    # Workers reload the config every tick; re-parse only when the file changed.
+    # Atomic rewrites replace the inode, so st_ino catches same-size rewrites
+    # landing within one mtime tick.
+    key = (st.st_mtime_ns, st.st_size, st.st_ino)
+    cached = _PARSE_CACHE.get(target)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    cfg = _parse_config(target)
+    _PARSE_CACHE[target] = (key, cfg)
+    return cfg
 
 
 def load_file_config(explicit: Optional[str]) -> FileConfig:
     target = config_target_path(explicit)
-    if not target.exists():
+    cfg = _load_cached(target)
+    if cfg is None:
         return _empty_file_config(target)
-    return _parse_config(target)
+    return cfg
+
+
+def invalidate_config_cache() -> None:
+    global _DEFAULT_PATH_CACHE
+    _PARSE_CACHE.clear()
+    _DEFAULT_PATH_CACHE = None
 
 
 def ensure_file_config(explicit: Optional[str]) -> Tuple[FileConfig, bool]:
     target = config_target_path(explicit)
-    if target.exists():
-        return _parse_config(target), False
+    cfg = _load_cached(target)
+    if cfg is not None:
+        return cfg, False
     boot = _bootstrap_file_config(target)
     written = write_file_config(boot, explicit)
     return replace(boot, path=written), True
@@ -344,7 +444,7 @@ def _fill_missing_defaults(cfg: FileConfig, explicit: Optional[str]) -> FileConf
             if cfg.interactive_source_bashrc is not None
             else base.interactive_source_bashrc
         ),
-        remote_env=dict(cfg.remote_env),
+        remote_env=cfg.remote_env,
     )
 
 
@@ -416,38 +516,20 @@ def _env_interactive_source_bashrc() -> Optional[bool]:
 
 def sync_env_to_file_config(explicit: Optional[str]) -> Tuple[FileConfig, bool, bool]:
     cfg, created = ensure_file_config(explicit)
-    updated = cfg
-    cache = _env_non_empty("PIGEON_CACHE")
-    namespace = _env_non_empty("PIGEON_NAMESPACE")
-    user = _env_non_empty("PIGEON_USER")
-    route = _env_non_empty("PIGEON_ROUTE")
-    worker_route = _env_non_empty("PIGEON_WORKER_ROUTE")
-    worker_max_jobs = _env_positive_int("PIGEON_WORKER_MAX_JOBS")
-    worker_poll_interval = _env_positive_float("PIGEON_WORKER_POLL_INTERVAL")
-    worker_debug = _env_bool("PIGEON_WORKER_DEBUG")
-    interactive_command = _env_non_empty("PIGEON_INTERACTIVE_COMMAND")
-    interactive_source_bashrc = _env_interactive_source_bashrc()
-
-    if cache is not None:
-        updated = replace(updated, cache=cache)
-    if namespace is not None:
-        updated = replace(updated, namespace=namespace)
-    if user is not None:
-        updated = replace(updated, user=user)
-    if route is not None:
-        updated = replace(updated, route=route)
-    if worker_route is not None:
-        updated = replace(updated, worker_route=worker_route)
-    if worker_max_jobs is not None:
-        updated = replace(updated, worker_max_jobs=worker_max_jobs)
-    if worker_poll_interval is not None:
-        updated = replace(updated, worker_poll_interval=worker_poll_interval)
-    if worker_debug is not None:
-        updated = replace(updated, worker_debug=worker_debug)
-    if interactive_command is not None:
-        updated = replace(updated, interactive_command=interactive_command)
-    if interactive_source_bashrc is not None:
-        updated = replace(updated, interactive_source_bashrc=interactive_source_bashrc)
+    overrides: Dict[str, Any] = {
+        "cache": _env_non_empty("PIGEON_CACHE"),
+        "namespace": _env_non_empty("PIGEON_NAMESPACE"),
+        "user": _env_non_empty("PIGEON_USER"),
+        "route": _env_non_empty("PIGEON_ROUTE"),
+        "worker_route": _env_non_empty("PIGEON_WORKER_ROUTE"),
+        "worker_max_jobs": _env_positive_int("PIGEON_WORKER_MAX_JOBS"),
+        "worker_poll_interval": _env_positive_float("PIGEON_WORKER_POLL_INTERVAL"),
+        "worker_debug": _env_bool("PIGEON_WORKER_DEBUG"),
+        "interactive_command": _env_non_empty("PIGEON_INTERACTIVE_COMMAND"),
+        "interactive_source_bashrc": _env_interactive_source_bashrc(),
+    }
+    diff = {k: v for k, v in overrides.items() if v is not None}
+    updated = replace(cfg, **diff) if diff else cfg
 
     changed = config_to_toml(cfg) != config_to_toml(updated)
     if created or changed:
@@ -472,6 +554,13 @@ def _non_empty(raw: str, key: str) -> str:
     return v
 
 
+def _remote_env_key(key: str) -> str:
+    m = _REMOTE_ENV_KEY_RE.match(key)
+    if m is None:
+        raise RuntimeError("remote_env key must match [A-Za-z_][A-Za-z0-9_]*")
+    return m.group(1)
+
+
 def set_config_value(cfg: FileConfig, key: str, value: str) -> FileConfig:
     k = key.strip()
     if k == "cache":
@@ -500,13 +589,11 @@ def set_config_value(cfg: FileConfig, key: str, value: str) -> FileConfig:
         return replace(cfg, worker_debug=_parse_bool_literal(value, k))
     if k == "worker.route":
         return replace(cfg, worker_route=_non_empty(value, k))
-    if k.startswith("remote_env."):
-        env_key = k[len("remote_env.") :].strip()
-        if not _ENV_KEY_RE.match(env_key):
-            raise RuntimeError("remote_env key must match [A-Za-z_][A-Za-z0-9_]*")
+    if k.startswith(_REMOTE_ENV_PREFIX):
+        env_key = _remote_env_key(k)
         env = dict(cfg.remote_env)
         env[env_key] = value
-        return replace(cfg, remote_env=env)
+        return replace(cfg, remote_env=tuple(sorted(env.items())))
     raise RuntimeError(f"unknown key: {key!r}")
 
 
@@ -532,13 +619,11 @@ def unset_config_value(cfg: FileConfig, key: str) -> FileConfig:
         return replace(cfg, worker_debug=None)
     if k == "worker.route":
         return replace(cfg, worker_route=None)
-    if k.startswith("remote_env."):
-        env_key = k[len("remote_env.") :].strip()
-        if not _ENV_KEY_RE.match(env_key):
-            raise RuntimeError("remote_env key must match [A-Za-z_][A-Za-z0-9_]*")
+    if k.startswith(_REMOTE_ENV_PREFIX):
+        env_key = _remote_env_key(k)
         env = dict(cfg.remote_env)
         env.pop(env_key, None)
-        return replace(cfg, remote_env=env)
+        return replace(cfg, remote_env=tuple(sorted(env.items())))
     raise RuntimeError(f"unknown key: {key!r}")
 
 
@@ -588,8 +673,8 @@ def config_to_toml(cfg: FileConfig) -> str:
         if lines:
             lines.append("")
         lines.append("[remote_env]")
-        for k in sorted(cfg.remote_env):
-            lines.append(f"{k} = {_q(cfg.remote_env[k])}")
+        for k, v in cfg.remote_env:
+            lines.append(f"{k} = {_q(v)}")
 
     if not lines:
         return ""
@@ -610,4 +695,4 @@ def write_file_config(cfg: FileConfig, explicit: Optional[str] = None) -> Path:
     finally:
         if os.path.exists(tmp_name):
             os.unlink(tmp_name)
-    return path.resolve()
+    return _abs_path(path)
@@ -1,23 +1,31 @@
 from __future__ import annotations
 
 import argparse
+import binascii
 import concurrent.futures
+import contextlib
 import errno
 import fcntl
+import functools
 import os
 import pty
-import select
+import selectors
 import signal
+import struct
 import subprocess
 import sys
+import termios
 import threading
 import time
-from typing import Dict, List, Tuple
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 from .common import (
     DEFAULT_POLL_INTERVAL,
     WORKER_HEARTBEAT_INTERVAL_SECONDS,
     FileLock,
+    JsonlAppender,
+    JsonlTailer,
     PigeonConfig,
     append_jsonl,
     atomic_write_json,
@@ -36,22 +44,40 @@ from .common import (
     status_path,
     stdin_path,
     stream_path,
-    tail_jsonl,
     utc_iso,
     write_worker_heartbeat,
 )
-from .config import FileConfig, config_target_path, load_file_config, sync_env_to_file_config
+from .config import (
+    FileConfig,
+    config_target_path,
+    load_file_config,
+    sync_env_to_file_config,
+)
 
 WORKER_CONFIG_RELOAD_INTERVAL_SECONDS = 1.0
+SESSION_IDLE_POLL_MAX = 0.05
+# PTY sessions are usually someone typing; a lower cap bounds keystroke latency.
+PTY_SESSION_IDLE_POLL_MAX = 0.02
+OUTPUT_BATCH_LIMIT = 1 << 20
 _SANITIZED_ENV_PREFIXES = ("CODEX_SANDBOX_",)
+_TERMINAL_STATES = frozenset({"succeeded", "failed", "cancelled"})
+_WINSIZE = struct.Struct("HHHH")
 
-
-def _normalize_route(value: object) -> str | None:
-    return normalize_route(value)
+# sessions_dir -> {session_id: (status stat stamp, state, request route)}
+_SESSION_STATE_CACHE: Dict[Path, Dict[str, Tuple[Tuple[int, int, int], object, str | None]]] = {}
+# sessions_dir -> (dir stat stamp, worker route, monotonic rescan deadline) of
+# the last scan with nothing to claim
+_QUIET_SESSIONS_DIRS: Dict[Path, Tuple[Tuple[int, int, int], str | None, float]] = {}
+_QUIET_SESSIONS_DIR_RESCAN_SECONDS = 1.0
+# cwd lock path -> [in-process lock taken before the flock on that path,
+# sessions holding or waiting for it]; dropped once the count is back to 0
+_CWD_THREAD_LOCKS: Dict[Path, List] = {}
+_CWD_THREAD_LOCKS_GUARD = threading.Lock()
 
 
-def _route_matches(worker_route: str | None, req_route: str | None) -> bool:
-    return route_matches(worker_route, req_route)
+# Aliases rather than wrappers: no extra call frame on the polling path.
+_normalize_route = normalize_route
+_route_matches = route_matches
 
 
 def _resolve_worker_route(parsed_args: argparse.Namespace, file_config: FileConfig) -> str | None:
@@ -87,15 +113,15 @@ def _downgrade_interactive_shell_flag(command: List[str]) -> List[str]:
     flag = str(command[1])
     if not flag.startswith("-") or "c" not in flag[1:] or "i" not in flag[1:]:
         return command
-    new_flag = "-" + "".join(ch for ch in flag[1:] if ch != "i")
-    if "c" not in new_flag:
-        return command
+    new_flag = flag.replace("i", "")
     out = list(command)
     out[1] = new_flag
     return out
 
 
+@functools.lru_cache(maxsize=None)
 def _supports_color() -> bool:
+    # Evaluated once per process; debug lines should not re-check the env.
     if os.environ.get("NO_COLOR"):
         return False
     if os.environ.get("FORCE_COLOR"):
@@ -112,27 +138,31 @@ def _paint(text: str, color_code: str, enabled: bool) -> str:
     return f"\x1b[{color_code}m{text}\x1b[0m"
 
 
+_DEBUG_KIND_COLORS = {
+    "lifecycle": "96",  # bright cyan
+    "queue": "95",  # bright magenta
+    "lock": "94",  # bright blue
+    "stdin": "92",  # bright green
+    "stdout": "37",  # white
+    "stderr": "93",  # bright yellow
+    "signal": "91",  # bright red
+    "success": "92",  # bright green
+    "failure": "91",  # bright red
+    "error": "91",  # bright red
+    "transport": "36",  # cyan
+    "info": "90",  # bright black
+}
+
+
 def _debug_log(enabled: bool, message: str, kind: str = "info") -> None:
+    # Hot-path callers guard with `if debug:` so the message f-string is never
+    # built when debug is off; `enabled` stays for the cheap one-off call sites.
     if not enabled:
         return
     use_color = _supports_color()
     ts = time.strftime("%H:%M:%S")
-    kind_colors = {
-        "lifecycle": "96",  # bright cyan
-        "queue": "95",  # bright magenta
-        "lock": "94",  # bright blue
-        "stdin": "92",  # bright green
-        "stdout": "37",  # white
-        "stderr": "93",  # bright yellow
-        "signal": "91",  # bright red
-        "success": "92",  # bright green
-        "failure": "91",  # bright red
-        "error": "91",  # bright red
-        "transport": "36",  # cyan
-        "info": "90",  # bright black
-    }
     kind_label = kind.upper()
-    color = kind_colors.get(kind, kind_colors["info"])
+    color = _DEBUG_KIND_COLORS.get(kind, _DEBUG_KIND_COLORS["info"])
     prefix = _paint("[pigeon-worker]", "90", use_color)
     debug_tag = _paint("[debug]", "2", use_color)
     kind_tag = _paint(f"[{kind_label}]", color, use_color)
@@ -143,7 +173,7 @@ def _debug_log(enabled: bool, message: str, kind: str = "info") -> None:
 
 def _bytes_preview(data: bytes, limit: int = 96) -> str:
     cut = data[:limit]
-    hex_part = " ".join(f"{b:02x}" for b in cut)
+    hex_part = binascii.hexlify(cut, " ").decode("ascii")
     txt = cut.decode("utf-8", "backslashreplace")
     txt = txt.replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
     extra = ""
@@ -152,6 +182,54 @@ def _bytes_preview(data: bytes, limit: int = 96) -> str:
     return f"len={len(data)} hex=[{hex_part}] text='{txt}'{extra}"
 
 
+def _drain_fd(fd: int, buf: memoryview, strict: bool) -> Tuple[memoryview, bool]:
+    """Read what a non-blocking fd has buffered into ``buf``; returns (data, eof).
+
+    ``data`` is a view of ``buf`` and is only valid until the next drain. EIO
+    (PTY slave closed) always means EOF. Other read errors are raised when
+    strict, and otherwise treated as EOF like a closed pipe.
+    """
+    total = 0
+    limit = len(buf)
+    while total < limit:
+        try:
+            n = os.readv(fd, [buf[total:]])
+        except BlockingIOError:
+            break
+        except OSError as exc:
+            if strict and exc.errno != errno.EIO:
+                raise
+            return buf[:total], True
+        if n == 0:
+            return buf[:total], True
+        total += n
+    return buf[:total], False
+
+
+def _write_pty_input(master_fd: int, pending: bytearray, eof_pending: bool) -> bool:
+    """Write queued stdin, then a ^D once ``eof_pending``, to the PTY master.
+
+    The master is non-blocking, so whatever the child's input queue does not
+    accept yet stays in ``pending``. Returns whether the ^D is still owed.
+    """
+    try:
+        while pending:
+            n = os.write(master_fd, pending)
+            if n <= 0:
+                return eof_pending
+            del pending[:n]
+        if eof_pending:
+            os.write(master_fd, b"\x04")
+            eof_pending = False
+    except BlockingIOError:
+        pass
+    except OSError:
+        # Slave side gone; nothing queued can be delivered any more.
+        pending.clear()
+        eof_pending = False
+    return eof_pending
+
+
 def _format_command(req: Dict[str, object]) -> str:
     cmd = req.get("command")
     if not isinstance(cmd, list):
@@ -166,10 +244,9 @@ def _shell_exit_code(returncode: int) -> int:
 
 
 def _build_child_env(env_in: object, unset_in: object) -> Dict[str, str]:
-    env: Dict[str, str] = dict(os.environ)
-    for key in list(env.keys()):
-        if any(key.startswith(prefix) for prefix in _SANITIZED_ENV_PREFIXES):
-            env.pop(key, None)
+    env: Dict[str, str] = {
+        k: v for k, v in os.environ.items() if not k.startswith(_SANITIZED_ENV_PREFIXES)
+    }
     if isinstance(unset_in, list):
         for item in unset_in:
             if isinstance(item, str) and item:
@@ -182,63 +259,215 @@ def _build_child_env(env_in: object, unset_in: object) -> Dict[str, str]:
 
 
 def _set_winsize(fd: int, rows: int, cols: int) -> None:
-    import struct
-    import termios
-
-    winsize = struct.pack("HHHH", rows, cols, 0, 0)
-    fcntl.ioctl(fd, termios.TIOCSWINSZ, winsize)
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, _WINSIZE.pack(rows, cols, 0, 0))
 
 
-def _update_status(config: PigeonConfig, session_id: str, state: str, **extra) -> None:
-    path = status_path(config, session_id)
-    prior: Dict[str, object] = {}
-    if path.exists():
-        prior = read_json(path)
-    prior.update(extra)
-    prior["session_id"] = session_id
-    prior["state"] = state
-    prior["updated_at"] = utc_iso()
-    atomic_write_json(path, prior)
+def _stat_stamp(path: Union[str, Path]) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class _SessionStatus:
+    """status.json of a session this worker has claimed.
+
+    After the claim the worker is the file's only writer, so the client's
+    pending record is read once and later updates are rewritten from memory.
+    """
+
+    def __init__(self, config: PigeonConfig, session_id: str):
+        self.session_id = session_id
+        self.path = status_path(config, session_id)
+        self._data: Optional[Dict[str, object]] = None
+
+    def update(self, state: str, **extra) -> None:
+        if self._data is None:
+            try:
+                self._data = read_json(self.path)
+            except FileNotFoundError:
+                self._data = {}
+        data = self._data
+        if (
+            data.get("state") == state
+            and data.get("session_id") == self.session_id
+            and "exit_code" in data
+            and data["exit_code"] == extra.get("exit_code")
+        ):
+            # Same state and exit code already on disk: only timestamps and
+            # metadata would move, so skip the rewrite.
+            return
+        data.update(extra)
+        data["session_id"] = self.session_id
+        data["state"] = state
+        data["updated_at"] = utc_iso()
+        # Still renamed into place so readers never see a partial file, but
+        # only terminal states pay for an fsync: a running record lost in a
+        # host crash describes a session that died with the host anyway.
+        atomic_write_json(self.path, data, durable=state in _TERMINAL_STATES)
 
 
 def _discover_pending(config: PigeonConfig, worker_route: str | None) -> List[str]:
-    if not config.sessions_dir.exists():
+    sessions_dir = config.sessions_dir
+    # Sessions only ever leave "pending", so once a scan found nothing
+    # claimable and nothing half-written, a new candidate requires a new
+    # session directory, which bumps the sessions_dir stamp. The stamp can
+    # miss an entry added within the mtime granularity or hidden by a stale
+    # NFS attribute cache, so a quiet directory is still rescanned now and then.
+    dir_stamp = _stat_stamp(sessions_dir)
+    if dir_stamp is None:
+        _SESSION_STATE_CACHE.pop(sessions_dir, None)
+        return []
+    quiet = _QUIET_SESSIONS_DIRS.get(sessions_dir)
+    if (
+        quiet is not None
+        and quiet[0] == dir_stamp
+        and quiet[1] == worker_route
+        and time.monotonic() < quiet[2]
+    ):
         return []
+    try:
+        with os.scandir(sessions_dir) as it:
+            sids = [entry.name for entry in it if entry.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        _SESSION_STATE_CACHE.pop(sessions_dir, None)
+        return []
+    incomplete = False
+    prev = _SESSION_STATE_CACHE.get(sessions_dir, {})
+    # Rebuilt from this scan only, so entries for removed sessions drop out.
+    seen: Dict[str, Tuple[Tuple[int, int, int], object, str | None]] = {}
     ids: List[str] = []
-    for entry in sorted(config.sessions_dir.iterdir()):
-        if not entry.is_dir():
-            continue
-        sid = entry.name
-        req = request_path(config, sid)
-        st = status_path(config, sid)
-        if not req.exists() or not st.exists():
+    base = os.fspath(sessions_dir)
+    for sid in sids:
+        cached = prev.get(sid)
+        if cached is not None and isinstance(cached[1], str) and cached[1] != "pending":
+            # Left "pending" for good; not even a stat until it is removed.
+            seen[sid] = cached
             continue
-        try:
-            state = read_json(st).get("state")
-            req_route = _normalize_route(read_json(req).get("route"))
-        except Exception:
+        # status.json is always replaced atomically, so an unchanged stamp means
+        # unchanged content and the cached state/route can be reused.
+        status_file = os.path.join(base, sid, "status.json")
+        stamp = _stat_stamp(status_file)
+        if stamp is None:
+            incomplete = True
             continue
-        if state == "pending":
-            if _route_matches(worker_route, req_route):
-                ids.append(sid)
+        if cached is not None and cached[0] == stamp:
+            _, state, req_route = cached
+        else:
+            # Check state first so non-pending sessions never pay for request.json.
+            try:
+                state = read_json(status_file).get("state")
+            except Exception:
+                incomplete = True
+                continue
+            req_route = None
+            if state == "pending":
+                try:
+                    req_route = _normalize_route(read_json(os.path.join(base, sid, "request.json")).get("route"))
+                except Exception:
+                    incomplete = True
+                    continue
+        seen[sid] = (stamp, state, req_route)
+        # Both routes are normalized (cached req_route included), so
+        # route_matches() reduces to equality: None only matches None.
+        if state == "pending" and req_route == worker_route:
+            ids.append(sid)
+    _SESSION_STATE_CACHE[sessions_dir] = seen
+    # Session ids start with a millisecond timestamp: sorting only the
+    # claimable ones keeps FIFO order without sorting the whole directory.
+    ids.sort()
+    if not ids and not incomplete:
+        rescan_at = time.monotonic() + _QUIET_SESSIONS_DIR_RESCAN_SECONDS
+        _QUIET_SESSIONS_DIRS[sessions_dir] = (dir_stamp, worker_route, rescan_at)
+    else:
+        _QUIET_SESSIONS_DIRS.pop(sessions_dir, None)
     return ids
 
 
 def _try_claim(config: PigeonConfig, session_id: str) -> bool:
     path = claim_path(config, session_id)
     try:
-        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | os.O_CLOEXEC, 0o644)
     except FileExistsError:
         return False
-    with os.fdopen(fd, "w", encoding="utf-8") as fh:
-        fh.write(f"worker_host={host_name()}\n")
-        fh.write(f"worker_pid={os.getpid()}\n")
-        fh.flush()
-        os.fsync(fh.fileno())
+    # O_EXCL alone decides the race; the host/pid body is informational, so it
+    # goes out in one write without an fsync.
+    try:
+        os.write(fd, f"worker_host={host_name()}\nworker_pid={os.getpid()}\n".encode("utf-8"))
+    finally:
+        os.close(fd)
     return True
 
 
-def _run_session_once(config: PigeonConfig, session_id: str, debug: bool = False) -> int:
+def _apply_control(
+    records: List[Dict[str, object]],
+    pgid: int,
+    master_fd: Optional[int],
+    session_id: str,
+    debug: bool,
+) -> None:
+    # Records apply in order and every signal is delivered, so programs that
+    # count interrupts see each one; only a resize repeating the size just
+    # applied is skipped.
+    applied: Optional[Tuple[int, int]] = None
+    for rec in records:
+        typ = rec.get("type")
+        if typ == "signal":
+            sig = rec.get("signal")
+            if not isinstance(sig, int):
+                continue
+            try:
+                os.killpg(pgid, sig)
+                if debug:
+                    _debug_log(True, f"session={session_id} signal forwarded sig={sig}", kind="signal")
+            except ProcessLookupError:
+                pass
+        elif typ == "resize" and master_fd is not None:
+            cols = rec.get("cols")
+            rows = rec.get("rows")
+            if not isinstance(cols, int) or not isinstance(rows, int):
+                continue
+            winsize = (max(rows, 1), max(cols, 1))
+            if winsize == applied:
+                continue
+            applied = winsize
+            try:
+                _set_winsize(master_fd, rows=winsize[0], cols=winsize[1])
+                if debug:
+                    _debug_log(
+                        True,
+                        f"session={session_id} resize applied cols={winsize[1]} rows={winsize[0]}",
+                        kind="transport",
+                    )
+            except OSError:
+                pass
+
+
+def _run_session_once(
+    config: PigeonConfig,
+    session_id: str,
+    debug: bool = False,
+    status: Optional[_SessionStatus] = None,
+) -> int:
+    if status is None:
+        status = _SessionStatus(config, session_id)
+    in_file = os.fspath(stdin_path(config, session_id))
+    ctrl_file = os.fspath(control_path(config, session_id))
+    with JsonlAppender(stream_path(config, session_id)) as stream_out:
+        with JsonlTailer(in_file) as in_tail, JsonlTailer(ctrl_file) as ctrl_tail:
+            return _run_session_io(config, session_id, stream_out, in_tail, ctrl_tail, status, debug=debug)
+
+
+def _run_session_io(
+    config: PigeonConfig,
+    session_id: str,
+    stream_out: JsonlAppender,
+    in_tail: JsonlTailer,
+    ctrl_tail: JsonlTailer,
+    status: _SessionStatus,
+    debug: bool = False,
+) -> int:
     req = read_json(request_path(config, session_id))
     command = req.get("command")
     cwd = req.get("cwd")
@@ -260,26 +489,25 @@ def _run_session_once(config: PigeonConfig, session_id: str, debug: bool = False
         size = None
 
     env = _build_child_env(req.get("env"), req.get("unset_env"))
-    _debug_log(
-        debug,
-        (
-            f"session={session_id} env TERM={env.get('TERM', '-') or '-'} "
-            f"NO_COLOR={'set' if 'NO_COLOR' in env else 'unset'} "
-            f"proxy={'set' if ('HTTPS_PROXY' in env or 'https_proxy' in env) else 'unset'} "
-            f"sandbox={'present' if any(k.startswith('CODEX_SANDBOX_') for k in env) else 'cleared'}"
-        ),
-        kind="transport",
-    )
+    if debug:
+        _debug_log(
+            True,
+            (
+                f"session={session_id} env TERM={env.get('TERM', '-') or '-'} "
+                f"NO_COLOR={'set' if 'NO_COLOR' in env else 'unset'} "
+                f"proxy={'set' if ('HTTPS_PROXY' in env or 'https_proxy' in env) else 'unset'} "
+                f"sandbox={'present' if any(k.startswith('CODEX_SANDBOX_') for k in env) else 'cleared'}"
+            ),
+            kind="transport",
+        )
 
-    _update_status(
-        config,
-        session_id,
+    status.update(
         "running",
         started_at=utc_iso(),
         worker={"host": host_name(), "pid": os.getpid()},
         exit_code=None,
     )
-    append_jsonl(stream_path(config, session_id), {"type": "event", "event": "started", "ts": utc_iso()})
+    stream_out.append({"type": "event", "event": "started", "ts": utc_iso()})
 
     use_pty = True
     try:
@@ -315,10 +543,7 @@ def _run_session_once(config: PigeonConfig, session_id: str, debug: bool = False
                 kind="transport",
             )
             command = downgraded
-        append_jsonl(
-            stream_path(config, session_id),
-            {"type": "event", "event": "pty_fallback_to_pipes", "ts": utc_iso()},
-        )
+        stream_out.append({"type": "event", "event": "pty_fallback_to_pipes", "ts": utc_iso()})
         proc = subprocess.Popen(
             command,
             cwd=cwd,
@@ -337,36 +562,52 @@ def _run_session_once(config: PigeonConfig, session_id: str, debug: bool = False
         )
 
     stdout_seq = 0
-    in_offset = 0
-    ctrl_offset = 0
     stdin_eof_forwarded = False
-    stream_out = stream_path(config, session_id)
-    in_file = stdin_path(config, session_id)
-    ctrl_file = control_path(config, session_id)
+    # PTY stdin the child has not consumed yet; the master is non-blocking for
+    # the output drain, so writes can come up short.
+    pty_pending = bytearray()
+    pty_eof_pending = False
+    pty_write_wanted = False
     stdout_fd = proc.stdout.fileno() if proc.stdout else -1
     stderr_fd = proc.stderr.fileno() if proc.stderr else -1
     stdout_open = stdout_fd >= 0
     stderr_open = stderr_fd >= 0
     pty_open = use_pty
+    # Register output fds once; EOF unregisters instead of rebuilding fd sets
+    # on every wakeup.
+    sel = selectors.DefaultSelector()
+    # Reused by every drain of this session; output is encoded straight from
+    # it, so reads allocate nothing.
+    out_view = memoryview(bytearray(OUTPUT_BATCH_LIMIT))
+    if use_pty:
+        os.set_blocking(master_fd, False)
+        sel.register(master_fd, selectors.EVENT_READ)
+    else:
+        for fd in (stdout_fd, stderr_fd):
+            if fd >= 0:
+                os.set_blocking(fd, False)
+                sel.register(fd, selectors.EVENT_READ)
 
+    poll_timeout = DEFAULT_POLL_INTERVAL
+    idle_poll_max = PTY_SESSION_IDLE_POLL_MAX if use_pty else SESSION_IDLE_POLL_MAX
     while True:
-        in_offset, in_records = tail_jsonl(in_file, in_offset)
+        prev_offsets = (in_tail.offset, ctrl_tail.offset)
+        # Leave further stdin in the file until the queued bytes are taken.
+        in_records = in_tail.poll() if not (pty_pending or pty_eof_pending) else []
         for rec in in_records:
             typ = rec.get("type")
             if typ == "stdin":
                 raw = rec.get("data_b64")
                 if isinstance(raw, str):
                     payload = decode_bytes(raw)
-                    _debug_log(
-                        debug,
-                        f"session={session_id} stdin seq={rec.get('seq')} {_bytes_preview(payload)}",
-                        kind="stdin",
-                    )
+                    if debug:
+                        _debug_log(
+                            True,
+                            f"session={session_id} stdin seq={rec.get('seq')} {_bytes_preview(payload)}",
+                            kind="stdin",
+                        )
                     if use_pty:
-                        try:
-                            os.write(master_fd, payload)
-                        except OSError:
-                            pass
+                        pty_pending += payload
                     else:
                         if proc.stdin:
                             try:
@@ -379,10 +620,7 @@ def _run_session_once(config: PigeonConfig, session_id: str, debug: bool = False
                     continue
                 _debug_log(debug, f"session={session_id} stdin eof", kind="stdin")
                 if use_pty:
-                    try:
-                        os.write(master_fd, b"\x04")
-                    except OSError:
-                        pass
+                    pty_eof_pending = True
                 else:
                     if proc.stdin:
                         try:
@@ -391,109 +629,74 @@ def _run_session_once(config: PigeonConfig, session_id: str, debug: bool = False
                             pass
                 stdin_eof_forwarded = True
 
-        ctrl_offset, ctrl_records = tail_jsonl(ctrl_file, ctrl_offset)
-        for rec in ctrl_records:
-            typ = rec.get("type")
-            if typ == "signal":
-                sig = rec.get("signal")
-                if not isinstance(sig, int):
-                    continue
-                try:
-                    os.killpg(proc.pid, sig)
-                    _debug_log(debug, f"session={session_id} signal forwarded sig={sig}", kind="signal")
-                except ProcessLookupError:
-                    pass
-            elif typ == "resize" and use_pty:
-                cols = rec.get("cols")
-                rows = rec.get("rows")
-                if not isinstance(cols, int) or not isinstance(rows, int):
-                    continue
-                cols = max(cols, 1)
-                rows = max(rows, 1)
-                try:
-                    _set_winsize(master_fd, rows=rows, cols=cols)
-                    _debug_log(
-                        debug,
-                        f"session={session_id} resize applied cols={cols} rows={rows}",
-                        kind="transport",
-                    )
-                except OSError:
-                    pass
-
-        if use_pty:
-            read_fds = [master_fd] if pty_open else []
+        ctrl_records = ctrl_tail.poll()
+        if ctrl_records:
+            _apply_control(ctrl_records, proc.pid, master_fd if use_pty else None, session_id, debug)
+
+        if pty_pending or pty_eof_pending:
+            pty_eof_pending = _write_pty_input(master_fd, pty_pending, pty_eof_pending)
+        if pty_open and pty_write_wanted != bool(pty_pending or pty_eof_pending):
+            pty_write_wanted = not pty_write_wanted
+            events = selectors.EVENT_READ
+            if pty_write_wanted:
+                events |= selectors.EVENT_WRITE
+            sel.modify(master_fd, events)
+
+        ready = [key.fd for key, mask in sel.select(timeout=poll_timeout) if mask & selectors.EVENT_READ]
+        # Back off while the session is idle so parked sessions (e.g. a shell
+        # waiting for input) stop waking their thread every 10ms; any output
+        # or input snaps back to the fast interval.
+        if ready or (in_tail.offset, ctrl_tail.offset) != prev_offsets:
+            poll_timeout = DEFAULT_POLL_INTERVAL
         else:
-            read_fds = []
-            if stdout_open:
-                read_fds.append(stdout_fd)
-            if stderr_open:
-                read_fds.append(stderr_fd)
-        ready, _, _ = select.select(read_fds, [], [], DEFAULT_POLL_INTERVAL)
+            poll_timeout = min(poll_timeout * 2, idle_poll_max)
+        # Records from one wakeup share a timestamp; format it once.
+        tick_ts = utc_iso() if ready else ""
         for fd in ready:
-            if use_pty:
-                try:
-                    chunk = os.read(master_fd, 4096)
-                except OSError as exc:
-                    if exc.errno == errno.EIO:
-                        chunk = b""
-                    else:
-                        raise
-                if chunk:
-                    _debug_log(
-                        debug,
-                        f"session={session_id} output channel=pty {_bytes_preview(chunk)}",
-                        kind="stdout",
-                    )
-                    append_jsonl(
-                        stream_out,
-                        {
-                            "type": "output",
-                            "seq": stdout_seq,
-                            "ts": utc_iso(),
-                            "channel": "pty",
-                            "data_b64": encode_bytes(chunk),
-                        },
-                    )
-                    stdout_seq += 1
+            # Drain everything available so one wakeup yields one record.
+            chunk, eof = _drain_fd(fd, out_view, strict=use_pty)
+            if chunk:
+                if use_pty:
+                    channel = "pty"
                 else:
-                    pty_open = False
-            else:
-                try:
-                    chunk = os.read(fd, 4096)
-                except OSError:
-                    chunk = b""
-                if chunk:
                     channel = "stdout" if fd == stdout_fd else "stderr"
+                if debug:
                     _debug_log(
-                        debug,
-                        f"session={session_id} output channel={channel} {_bytes_preview(chunk)}",
-                        kind="stdout" if channel == "stdout" else "stderr",
+                        True,
+                        f"session={session_id} output channel={channel} {_bytes_preview(bytes(chunk))}",
+                        kind="stderr" if channel == "stderr" else "stdout",
                     )
-                    append_jsonl(
-                        stream_out,
-                        {
-                            "type": "output",
-                            "seq": stdout_seq,
-                            "ts": utc_iso(),
-                            "channel": channel,
-                            "data_b64": encode_bytes(chunk),
-                        },
-                    )
-                    stdout_seq += 1
-                else:
-                    if fd == stdout_fd:
-                        stdout_open = False
-                    if fd == stderr_fd:
-                        stderr_open = False
-
+                stream_out.append(
+                    {
+                        "type": "output",
+                        "seq": stdout_seq,
+                        "ts": tick_ts,
+                        "channel": channel,
+                        "data_b64": encode_bytes(chunk),
+                    },
+                )
+                stdout_seq += 1
+            if eof:
+                if use_pty:
+                    pty_open = False
+                    pty_pending.clear()
+                    pty_eof_pending = False
+                if fd == stdout_fd:
+                    stdout_open = False
+                if fd == stderr_fd:
+                    stderr_open = False
+                sel.unregister(fd)
+
+        # Output EOF is tracked by the selector; only reap the child (a
+        # waitpid syscall) once every output fd has hit EOF.
         if use_pty:
-            done = proc.poll() is not None
-            if done and not pty_open:
+            if not pty_open and proc.poll() is not None:
                 break
         else:
-            if proc.poll() is not None and not stdout_open and not stderr_open:
+            if not stdout_open and not stderr_open and proc.poll() is not None:
                 break
 
+    sel.close()
     code = proc.wait()
     if use_pty:
         try:
@@ -506,8 +709,7 @@ def _run_session_once(config: PigeonConfig, session_id: str, debug: bool = False
         f"session={session_id} exec end raw_return={int(code)} shell_exit={shell_code}",
         kind="success" if shell_code == 0 else "failure",
     )
-    append_jsonl(
-        stream_out,
+    stream_out.append(
         {
             "type": "event",
             "event": "exit",
@@ -519,26 +721,53 @@ def _run_session_once(config: PigeonConfig, session_id: str, debug: bool = False
     return shell_code
 
 
-def _run_session(config: PigeonConfig, session_id: str, debug: bool = False) -> Tuple[int, str]:
+@contextlib.contextmanager
+def _cwd_thread_lock(lock: Path) -> Iterator[None]:
+    # Sessions of this worker queue on a thread lock, so at most one of them
+    # per cwd sits in flock(); the file lock still serializes across workers.
+    with _CWD_THREAD_LOCKS_GUARD:
+        entry = _CWD_THREAD_LOCKS.get(lock)
+        if entry is None:
+            entry = _CWD_THREAD_LOCKS[lock] = [threading.Lock(), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _CWD_THREAD_LOCKS_GUARD:
+            entry[1] -= 1
+            if not entry[1]:
+                del _CWD_THREAD_LOCKS[lock]
+
+
+def _run_session(
+    config: PigeonConfig,
+    session_id: str,
+    debug: bool = False,
+    status: Optional[_SessionStatus] = None,
+) -> Tuple[int, str]:
+    if status is None:
+        status = _SessionStatus(config, session_id)
     req = read_json(request_path(config, session_id))
     cwd = req.get("cwd")
     if not isinstance(cwd, str):
         raise RuntimeError("invalid cwd")
     lock = cwd_lock_path(config, cwd)
     _debug_log(debug, f"session={session_id} waiting cwd_lock={lock}", kind="lock")
-    with FileLock(lock):
+    with _cwd_thread_lock(lock), FileLock(lock):
         _debug_log(debug, f"session={session_id} acquired cwd_lock={lock}", kind="lock")
-        code = _run_session_once(config, session_id, debug=debug)
+        code = _run_session_once(config, session_id, debug=debug, status=status)
     if code == 0:
-        _update_status(config, session_id, "succeeded", finished_at=utc_iso(), exit_code=0)
+        status.update("succeeded", finished_at=utc_iso(), exit_code=0)
     else:
-        _update_status(config, session_id, "failed", finished_at=utc_iso(), exit_code=code)
+        status.update("failed", finished_at=utc_iso(), exit_code=code)
     return code, "ok"
 
 
 def _run_session_safe(config: PigeonConfig, session_id: str, debug: bool = False) -> Tuple[int, str]:
+    status = _SessionStatus(config, session_id)
     try:
-        return _run_session(config, session_id, debug=debug)
+        return _run_session(config, session_id, debug=debug, status=status)
     except Exception as exc:
         _debug_log(debug, f"session={session_id} worker_error {type(exc).__name__}: {exc}", kind="error")
         append_jsonl(
@@ -550,9 +779,7 @@ def _run_session_safe(config: PigeonConfig, session_id: str, debug: bool = False
                 "ts": utc_iso(),
             },
         )
-        _update_status(
-            config,
-            session_id,
+        status.update(
             "failed",
             finished_at=utc_iso(),
             exit_code=1,
@@ -603,12 +830,32 @@ def run_worker(parsed_args: argparse.Namespace) -> int:
         next_heartbeat = now + max(WORKER_HEARTBEAT_INTERVAL_SECONDS, poll_interval)
 
     stop = threading.Event()
+    # Self-pipe that cuts the poll sleep short: the interpreter writes to it on
+    # shutdown signals (set_wakeup_fd, safe at any point of the main thread,
+    # unlike an Event whose lock the interrupted code may hold), and session
+    # threads write to it when they finish, so freed capacity is refilled
+    # without waiting out the interval.
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    os.set_blocking(wake_w, False)
+    wake_sel = selectors.DefaultSelector()
+    wake_sel.register(wake_r, selectors.EVENT_READ)
 
     def _stop(signum, frame) -> None:
+        # Only the main loop ever waits on this Event, and it merely polls
+        # is_set(), so set() cannot find its lock held.
         stop.set()
 
+    def _session_done(fut: concurrent.futures.Future) -> None:
+        try:
+            os.write(wake_w, b"\0")
+        except OSError:
+            # Pipe full: a wakeup is already pending.
+            pass
+
     old_int = signal.getsignal(signal.SIGINT)
     old_term = signal.getsignal(signal.SIGTERM)
+    old_wakeup_fd = signal.set_wakeup_fd(wake_w, warn_on_full_buffer=False)
     signal.signal(signal.SIGINT, _stop)
     signal.signal(signal.SIGTERM, _stop)
 
@@ -625,6 +872,8 @@ def run_worker(parsed_args: argparse.Namespace) -> int:
                 now = now_ts()
                 if config_file_path and now >= next_config_reload:
                     try:
+                        # default_config_path() memoizes on the pointer
+                        # file, so this is a stat while nothing moved.
                         latest_path = str(config_target_path(None))
                         if latest_path != config_file_path:
                             config_file_path = latest_path
@@ -684,12 +933,22 @@ def run_worker(parsed_args: argparse.Namespace) -> int:
                         _debug_log(debug, f"session={sid} claimed", kind="queue")
                         fut = pool.submit(_run_session_safe, config, sid, debug)
                         futures[fut] = sid
+                        fut.add_done_callback(_session_done)
                         capacity -= 1
 
-                time.sleep(max(poll_interval, 0.01))
+                if wake_sel.select(timeout=max(poll_interval, 0.01)):
+                    try:
+                        while os.read(wake_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
     finally:
         remove_worker_heartbeat(config, worker_id)
         _debug_log(debug, "worker stop", kind="lifecycle")
         signal.signal(signal.SIGINT, old_int)
         signal.signal(signal.SIGTERM, old_term)
+        signal.set_wakeup_fd(old_wakeup_fd)
+        wake_sel.close()
+        os.close(wake_r)
+        os.close(wake_w)
     return 0
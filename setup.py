@@ -8,4 +8,5 @@ setup(
     packages=find_packages(),
     entry_points={"console_scripts": ["pigeon=pigeon.cli:main"]},
     python_requires=">=3.9",
+    extras_require={"fast": ["orjson>=3.5", "pybase64"]},
 )
@@ -0,0 +1,29 @@
+"""Helpers shared by the test modules.
+
+tests/ is not a package; the runner (``python -m unittest discover -s tests``)
+puts it on sys.path, so test modules import this as ``_support``.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TempRootTestCase(unittest.TestCase):
+    """One temp root per class; each test works in its own subdirectory."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._tmp_root = tempfile.mkdtemp(prefix=f"pigeon-{cls.__name__}-")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls._tmp_root, ignore_errors=True)
+
+    def _test_dir(self) -> str:
+        path = os.path.join(self._tmp_root, self._testMethodName)
+        os.mkdir(path)
+        return path
@@ -59,7 +59,7 @@ class CliParsingTests(unittest.TestCase):
             body = cfg.read_text(encoding="utf-8")
             self.assertIn('cache = "/tmp/pigeon-cache"', body)
             self.assertIn('namespace = "cli-test-user"', body)
-            self.assertEqual(path_buf.getvalue().strip(), str(cfg.resolve()))
+            self.assertEqual(path_buf.getvalue().strip(), str(cfg))
 
     def test_main_rejects_removed_config_flag(self) -> None:
         err = StringIO()
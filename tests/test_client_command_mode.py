@@ -2,44 +2,68 @@ from __future__ import annotations
 
 import argparse
 import os
-import tempfile
+import threading
+import time
 import unittest
-from contextlib import redirect_stderr
-from io import StringIO
+from contextlib import ExitStack, redirect_stderr
+from dataclasses import replace
+from io import BytesIO, StringIO
 from pathlib import Path
 from unittest import mock
 
 from pigeon.client import (
     _build_request,
     _find_ambiguous_operator_token,
+    _drain_stream,
     _format_interactive_panel,
     _normalize_exec_command,
     _resolve_worker_wait_timeout,
     _shell_prelude,
     _wait_for_worker,
+    _write_output_records,
     run_command,
 )
-from pigeon.common import PigeonConfig, now_ts, read_json, request_path, write_worker_heartbeat
-from pigeon.config import FileConfig
+from pigeon.common import (
+    JsonlAppender,
+    JsonlTailer,
+    PigeonConfig,
+    append_jsonl,
+    encode_bytes,
+    now_ts,
+    read_json,
+    request_path,
+    write_worker_heartbeat,
+)
+from pigeon.config import _EMPTY_FILE_CONFIG, FileConfig
+
+from _support import TempRootTestCase
+
+# run_command and the panel formatter only read these, so tests share them.
+_DEFAULT_ARGS = argparse.Namespace(verbose=False, route=None, wait_worker=0.0)
+_PCFG_TMP = PigeonConfig(cache_root=Path("/tmp/pigeon-cache"), namespace="ns-a")
 
 
-class ClientCommandModeTests(unittest.TestCase):
+class ClientCommandModeTests(TempRootTestCase):
+    _NO_ENV: dict[str, str] = {}
+
+    @staticmethod
+    def _patched(env: dict[str, str], patches: dict[str, dict[str, object]]) -> ExitStack:
+        """Swap in ``env`` as os.environ and apply ``{target: patch kwargs}`` in one stack."""
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.dict(os.environ, env, clear=True))
+            for target, kwargs in patches.items():
+                stack.enter_context(mock.patch(target, **kwargs))
+            return stack.pop_all()
+
     @staticmethod
     def _cfg(remote_env: dict[str, str] | None = None) -> FileConfig:
-        return FileConfig(
-            path=None,
-            cache=None,
-            namespace=None,
-            route=None,
-            user=None,
-            worker_max_jobs=None,
-            worker_poll_interval=None,
-            worker_debug=None,
-            worker_route=None,
-            interactive_command=None,
-            interactive_source_bashrc=None,
-            remote_env=remote_env or {},
-        )
+        if not remote_env:
+            return _EMPTY_FILE_CONFIG
+        return replace(_EMPTY_FILE_CONFIG, remote_env=tuple(sorted(remote_env.items())))
+
+    @classmethod
+    def _cfg_with(cls, remote_env: dict[str, str] | None = None, **overrides: object) -> FileConfig:
+        return replace(cls._cfg(remote_env), **overrides)
 
     def test_plain_command_is_wrapped_with_clean_bash_c(self) -> None:
         wrapped = _normalize_exec_command(["codex", "--version"], self._cfg())
@@ -56,7 +80,7 @@ class ClientCommandModeTests(unittest.TestCase):
         self.assertEqual(wrapped, ["bash", "--noprofile", "--norc", "-i"])
 
     def test_interactive_mode_uses_configured_command(self) -> None:
-        cfg = FileConfig(**{**self._cfg().__dict__, "interactive_command": "zsh -i"})
+        cfg = self._cfg_with(interactive_command="zsh -i")
         wrapped = _normalize_exec_command([], cfg, command_mode="interactive")
         self.assertEqual(wrapped, ["zsh", "-i"])
 
@@ -76,31 +100,28 @@ class ClientCommandModeTests(unittest.TestCase):
         self.assertEqual(wrapped, ["bash", "--noprofile", "--norc", "-c", "pwd; echo hi"])
 
     def test_shell_prelude_enables_color_aliases_for_tty(self) -> None:
-        with mock.patch.dict(os.environ, {}, clear=True):
-            with mock.patch("pigeon.client.sys.stdout.isatty", return_value=True):
-                prelude = _shell_prelude(self._cfg())
+        with mock.patch("pigeon.client.sys.stdout.isatty", return_value=True):
+            prelude = _shell_prelude(self._cfg(), env=self._NO_ENV)
         self.assertIn("alias ls='ls --color=always'\n", prelude)
         self.assertTrue(prelude.endswith("\n"))
 
     def test_shell_prelude_can_silently_source_bashrc(self) -> None:
-        cfg = FileConfig(**{**self._cfg().__dict__, "interactive_source_bashrc": True})
-        with mock.patch.dict(os.environ, {}, clear=True):
-            with mock.patch("pigeon.client.sys.stdout.isatty", return_value=False):
-                prelude = _shell_prelude(cfg)
+        cfg = self._cfg_with(interactive_source_bashrc=True)
+        with mock.patch("pigeon.client.sys.stdout.isatty", return_value=False):
+            prelude = _shell_prelude(cfg, env=self._NO_ENV)
         self.assertIn(". ~/.bashrc >/dev/null 2>&1", prelude)
 
     def test_remote_env_from_config_has_highest_priority(self) -> None:
-        file_cfg = self._cfg({"FOO": "from_config", "BAR": "bar_cfg"})
-        file_cfg = FileConfig(**{**file_cfg.__dict__, "user": "cfg-user"})
-        with mock.patch.dict(os.environ, {"FOO": "from_local", "USER": "local-user"}, clear=True):
-            req = _build_request(
-                command=["bash", "-lc", "echo x"],
-                cwd="/tmp",
-                session_id="sid",
-                file_config=file_cfg,
-                route=None,
-                extra_env={"FOO": "from_extra", "BAZ": "baz_extra"},
-            )
+        file_cfg = self._cfg_with({"FOO": "from_config", "BAR": "bar_cfg"}, user="cfg-user")
+        req = _build_request(
+            command=["bash", "-lc", "echo x"],
+            cwd="/tmp",
+            session_id="sid",
+            file_config=file_cfg,
+            route=None,
+            extra_env={"FOO": "from_extra", "BAZ": "baz_extra"},
+            local_env={"FOO": "from_local", "USER": "local-user"},
+        )
         env = req["env"]
         self.assertIsInstance(env, dict)
         self.assertEqual(env["FOO"], "from_config")
@@ -139,29 +160,47 @@ class ClientCommandModeTests(unittest.TestCase):
         self.assertEqual(raw, ["NO_COLOR", "FORCE_COLOR"])
 
     def test_run_command_interactive_sets_default_ps1(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            cfg_path = Path(tmp) / "cfg.toml"
-            cache_root = Path(tmp) / "cache"
-            session_id = "sid-test"
-            env = {
-                "PIGEON_CONFIG": str(cfg_path),
-                "PIGEON_CACHE": str(cache_root),
-                "PIGEON_NAMESPACE": "ns-test",
-            }
-            args = argparse.Namespace(verbose=False, route=None, wait_worker=0.0)
-            with mock.patch.dict(os.environ, env, clear=True):
-                with mock.patch("pigeon.client._wait_for_worker", return_value=[{"worker_id": "w1"}]):
-                    with mock.patch("pigeon.client.discover_active_workers", return_value=[]):
-                        with mock.patch("pigeon.client.new_session_id", return_value=session_id):
-                            with mock.patch("pigeon.client._print_interactive_panel"):
-                                rc = run_command([], args, command_mode="interactive")
-            cfg = PigeonConfig(cache_root=cache_root.resolve(), namespace="ns-test")
-            req = read_json(request_path(cfg, session_id))
+        tmp = Path(self._test_dir())
+        cfg_path = tmp / "cfg.toml"
+        cache_root = tmp / "cache"
+        session_id = "sid-test"
+        env = {
+            "PIGEON_CONFIG": str(cfg_path),
+            "PIGEON_CACHE": str(cache_root),
+            "PIGEON_NAMESPACE": "ns-test",
+        }
+        args = _DEFAULT_ARGS
+        patches = {
+            "pigeon.client._wait_for_worker": {"return_value": [{"worker_id": "w1"}]},
+            "pigeon.client.discover_active_workers": {"return_value": []},
+            "pigeon.client.new_session_id": {"return_value": session_id},
+            "pigeon.client._print_interactive_panel": {},
+        }
+        with self._patched(env, patches):
+            rc = run_command([], args, command_mode="interactive")
+        cfg = PigeonConfig(cache_root=cache_root.resolve(), namespace="ns-test")
+        req = read_json(request_path(cfg, session_id))
         self.assertEqual(rc, 4)
         env_map = req["env"]
         self.assertIsInstance(env_map, dict)
         self.assertEqual(env_map.get("PS1"), "[pigeon][\\u@\\h \\w]\\$ ")
 
+    def test_run_command_closes_control_file_when_raw_mode_fails(self) -> None:
+        tmp = Path(self._test_dir())
+        env = {
+            "PIGEON_CONFIG": str(tmp / "cfg.toml"),
+            "PIGEON_CACHE": str(tmp / "cache"),
+            "PIGEON_NAMESPACE": "ns-test",
+        }
+        patches = {
+            "pigeon.client._wait_for_worker": {"return_value": [{"worker_id": "w1"}]},
+            "pigeon.client._TerminalMode.enter": {"side_effect": OSError("no tty")},
+        }
+        with self._patched(env, patches), mock.patch("pigeon.client.JsonlAppender.close", autospec=True) as close:
+            with self.assertRaises(OSError):
+                run_command(["true"], _DEFAULT_ARGS, command_mode="argv")
+        close.assert_called_once()
+
     def test_ambiguous_operator_token_detection(self) -> None:
         self.assertEqual(_find_ambiguous_operator_token(["echo", "|", "wc"]), "|")
         self.assertEqual(_find_ambiguous_operator_token(["echo", "&&", "true"]), "&&")
@@ -169,7 +208,7 @@ class ClientCommandModeTests(unittest.TestCase):
 
     def test_run_command_rejects_ambiguous_operator_tokens(self) -> None:
         err = StringIO()
-        args = argparse.Namespace(verbose=False, route=None, wait_worker=0.0)
+        args = _DEFAULT_ARGS
         with redirect_stderr(err):
             rc = run_command(["echo", "|", "wc"], args, command_mode="argv")
         self.assertEqual(rc, 2)
@@ -177,46 +216,43 @@ class ClientCommandModeTests(unittest.TestCase):
         self.assertIn("pigeon -c", err.getvalue())
 
     def test_format_interactive_panel_contains_key_fields(self) -> None:
-        cfg = FileConfig(
-            **{
-                **self._cfg({"HTTPS_PROXY": "http://proxy:8080"}).__dict__,
-                "path": Path("/tmp/pigeon.toml"),
-                "route": "cpu-a",
-                "worker_route": "cpu-a",
-                "worker_max_jobs": 8,
-                "worker_poll_interval": 0.2,
-                "worker_debug": True,
-                "interactive_command": "bash --noprofile --norc -i",
-                "interactive_source_bashrc": False,
-            }
+        cfg = self._cfg_with(
+            {"HTTPS_PROXY": "http://proxy:8080"},
+            path=Path("/tmp/pigeon.toml"),
+            route="cpu-a",
+            worker_route="cpu-a",
+            worker_max_jobs=8,
+            worker_poll_interval=0.2,
+            worker_debug=True,
+            interactive_command="bash --noprofile --norc -i",
+            interactive_source_bashrc=False,
         )
-        p_cfg = PigeonConfig(cache_root=Path("/tmp/pigeon-cache"), namespace="ns-a")
-        with mock.patch.dict(os.environ, {}, clear=True):
-            with mock.patch("pigeon.client.sys.stderr.isatty", return_value=False):
-                out = _format_interactive_panel(
-                    session_id="sid-a",
-                    config=p_cfg,
-                    cwd="/work/repo",
-                    req_route="cpu-a",
-                    file_config=cfg,
-                    active_workers=[
-                        {
-                            "worker_id": "w1",
-                            "host": "cpu-a",
-                            "pid": 1234,
-                            "route": "cpu-a",
-                            "updated_at": "2026-02-27T00:00:00.000000Z",
-                        },
-                        {
-                            "worker_id": "w2",
-                            "host": "cpu-a",
-                            "pid": 1235,
-                            "route": "cpu-a",
-                            "updated_at": "2026-02-27T00:00:01.000000Z",
-                        },
-                    ],
-                    remote_command=["bash", "--noprofile", "--norc", "-i"],
-                )
+        p_cfg = _PCFG_TMP
+        with self._patched(self._NO_ENV, {"pigeon.client.sys.stderr.isatty": {"return_value": False}}):
+            out = _format_interactive_panel(
+                session_id="sid-a",
+                config=p_cfg,
+                cwd="/work/repo",
+                req_route="cpu-a",
+                file_config=cfg,
+                active_workers=[
+                    {
+                        "worker_id": "w1",
+                        "host": "cpu-a",
+                        "pid": 1234,
+                        "route": "cpu-a",
+                        "updated_at": "2026-02-27T00:00:00.000000Z",
+                    },
+                    {
+                        "worker_id": "w2",
+                        "host": "cpu-a",
+                        "pid": 1235,
+                        "route": "cpu-a",
+                        "updated_at": "2026-02-27T00:00:01.000000Z",
+                    },
+                ],
+                remote_command=["bash", "--noprofile", "--norc", "-i"],
+            )
         self.assertIn("Pigeon Interactive", out)
         self.assertIn("session_id", out)
         self.assertIn("config.path", out)
@@ -228,47 +264,48 @@ class ClientCommandModeTests(unittest.TestCase):
 
     def test_format_interactive_panel_color_toggle(self) -> None:
         cfg = self._cfg()
-        p_cfg = PigeonConfig(cache_root=Path("/tmp/pigeon-cache"), namespace="ns-a")
-        with mock.patch.dict(os.environ, {"FORCE_COLOR": "1"}, clear=True):
-            with mock.patch("pigeon.client.sys.stderr.isatty", return_value=False):
-                colored = _format_interactive_panel(
-                    session_id="sid-c",
-                    config=p_cfg,
-                    cwd="/tmp",
-                    req_route=None,
-                    file_config=cfg,
-                    active_workers=[{"worker_id": "w1"}],
-                    remote_command=["bash", "--noprofile", "--norc", "-i"],
-                )
+        p_cfg = _PCFG_TMP
+        with self._patched({"FORCE_COLOR": "1"}, {"pigeon.client.sys.stderr.isatty": {"return_value": False}}):
+            colored = _format_interactive_panel(
+                session_id="sid-c",
+                config=p_cfg,
+                cwd="/tmp",
+                req_route=None,
+                file_config=cfg,
+                active_workers=[{"worker_id": "w1"}],
+                remote_command=["bash", "--noprofile", "--norc", "-i"],
+            )
         self.assertIn("\x1b[", colored)
-        with mock.patch.dict(os.environ, {"NO_COLOR": "1"}, clear=True):
-            with mock.patch("pigeon.client.sys.stderr.isatty", return_value=True):
-                plain = _format_interactive_panel(
-                    session_id="sid-p",
-                    config=p_cfg,
-                    cwd="/tmp",
-                    req_route=None,
-                    file_config=cfg,
-                    active_workers=[{"worker_id": "w1"}],
-                    remote_command=["bash", "--noprofile", "--norc", "-i"],
-                )
+        with self._patched({"NO_COLOR": "1"}, {"pigeon.client.sys.stderr.isatty": {"return_value": True}}):
+            plain = _format_interactive_panel(
+                session_id="sid-p",
+                config=p_cfg,
+                cwd="/tmp",
+                req_route=None,
+                file_config=cfg,
+                active_workers=[{"worker_id": "w1"}],
+                remote_command=["bash", "--noprofile", "--norc", "-i"],
+            )
         self.assertNotIn("\x1b[", plain)
 
     def test_run_command_interactive_prints_panel_once(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            cfg_path = Path(tmp) / "cfg.toml"
-            cache_root = Path(tmp) / "cache"
-            env = {
-                "PIGEON_CONFIG": str(cfg_path),
-                "PIGEON_CACHE": str(cache_root),
-                "PIGEON_NAMESPACE": "ns-test",
-            }
-            args = argparse.Namespace(verbose=False, route=None, wait_worker=0.0)
-            with mock.patch.dict(os.environ, env, clear=True):
-                with mock.patch("pigeon.client._wait_for_worker", return_value=[{"worker_id": "w1"}]):
-                    with mock.patch("pigeon.client.discover_active_workers", return_value=[]):
-                        with mock.patch("pigeon.client._print_interactive_panel") as panel_mock:
-                            rc = run_command([], args, command_mode="interactive")
+        tmp = Path(self._test_dir())
+        cfg_path = tmp / "cfg.toml"
+        cache_root = tmp / "cache"
+        env = {
+            "PIGEON_CONFIG": str(cfg_path),
+            "PIGEON_CACHE": str(cache_root),
+            "PIGEON_NAMESPACE": "ns-test",
+        }
+        args = _DEFAULT_ARGS
+        panel_mock = mock.Mock()
+        patches = {
+            "pigeon.client._wait_for_worker": {"return_value": [{"worker_id": "w1"}]},
+            "pigeon.client.discover_active_workers": {"return_value": []},
+            "pigeon.client._print_interactive_panel": {"new": panel_mock},
+        }
+        with self._patched(env, patches):
+            rc = run_command([], args, command_mode="interactive")
         self.assertEqual(rc, 4)
         panel_mock.assert_called_once()
 
@@ -284,21 +321,21 @@ class ClientCommandModeTests(unittest.TestCase):
 
     def test_rewrite_restores_remote_env_ref_when_local_already_expanded(self) -> None:
         file_cfg = self._cfg({"HTTPS_PROXY": "http://proxy.example:8080"})
-        with mock.patch.dict(os.environ, {"HTTPS_PROXY": "http://0.0.0.0:7890"}, clear=True):
-            wrapped = _normalize_exec_command(
-                ["echo", "http://0.0.0.0:7890"],
-                file_cfg,
-            )
+        wrapped = _normalize_exec_command(
+            ["echo", "http://0.0.0.0:7890"],
+            file_cfg,
+            env={"HTTPS_PROXY": "http://0.0.0.0:7890"},
+        )
         self.assertEqual(wrapped[0:4], ["bash", "--noprofile", "--norc", "-c"])
         self.assertEqual(wrapped[4], "echo $HTTPS_PROXY")
 
     def test_rewrite_prefers_inline_assignment_rhs(self) -> None:
         file_cfg = self._cfg({"HTTPS_PROXY": "http://proxy.example:8080"})
-        with mock.patch.dict(os.environ, {"HTTPS_PROXY": "http://0.0.0.0:7890"}, clear=True):
-            wrapped = _normalize_exec_command(
-                ["HTTPS_PROXY=http://proxy.example:8080", "echo", "http://0.0.0.0:7890"],
-                file_cfg,
-            )
+        wrapped = _normalize_exec_command(
+            ["HTTPS_PROXY=http://proxy.example:8080", "echo", "http://0.0.0.0:7890"],
+            file_cfg,
+            env={"HTTPS_PROXY": "http://0.0.0.0:7890"},
+        )
         self.assertEqual(wrapped[0:4], ["bash", "--noprofile", "--norc", "-c"])
         self.assertEqual(wrapped[4], "HTTPS_PROXY=http://proxy.example:8080 echo http://proxy.example:8080")
 
@@ -307,29 +344,77 @@ class ClientCommandModeTests(unittest.TestCase):
             timeout = _resolve_worker_wait_timeout(argparse.Namespace(wait_worker=None))
         self.assertAlmostEqual(timeout, 3.0, places=6)
 
+    def test_write_output_records_joins_runs_per_channel(self) -> None:
+        out = mock.Mock(buffer=BytesIO())
+        err = mock.Mock(buffer=BytesIO())
+        records = [
+            {"type": "output", "channel": "pty", "data_b64": encode_bytes(b"a")},
+            {"type": "output", "channel": "stdout", "data_b64": encode_bytes(b"b")},
+            {"type": "output", "channel": "stderr", "data_b64": encode_bytes(b"!")},
+            {"type": "event", "event": "exit", "exit_code": 3},
+        ]
+        with mock.patch("pigeon.client.sys.stdout", out), mock.patch("pigeon.client.sys.stderr", err):
+            code = _write_output_records(records)
+        self.assertEqual(code, 3)
+        self.assertEqual(out.buffer.getvalue(), b"ab")
+        self.assertEqual(err.buffer.getvalue(), b"!")
+
+    def _stream_with(self, *records: dict) -> Path:
+        path = Path(self._test_dir()) / "stream.jsonl"
+        with JsonlAppender(path) as out:
+            for rec in records:
+                out.append(rec)
+        return path
+
+    def test_stream_drain_gives_up_without_final_event(self) -> None:
+        path = self._stream_with({"type": "output", "channel": "stdout", "data_b64": encode_bytes(b"a")})
+        out = mock.Mock(buffer=BytesIO())
+        start = time.monotonic()
+        with mock.patch("pigeon.client.sys.stdout", out):
+            code = _drain_stream(JsonlTailer(path), 0.1)
+        self.assertIsNone(code)
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual(out.buffer.getvalue(), b"a")
+
+    def test_stream_drain_waits_for_late_exit_event(self) -> None:
+        path = self._stream_with({"type": "event", "event": "started"})
+        late = threading.Timer(0.05, append_jsonl, (path, {"type": "event", "event": "exit", "exit_code": 5}))
+        late.start()
+        self.addCleanup(late.cancel)
+        start = time.monotonic()
+        code = _drain_stream(JsonlTailer(path), 5.0)
+        self.assertEqual(code, 5)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_stream_drain_stops_at_worker_error(self) -> None:
+        path = self._stream_with({"type": "event", "event": "worker_error", "message": "boom"})
+        start = time.monotonic()
+        self.assertIsNone(_drain_stream(JsonlTailer(path), 5.0))
+        self.assertLess(time.monotonic() - start, 1.0)
+
     def test_wait_for_worker_returns_empty_when_none(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
-            cfg.ensure_dirs()
-            workers = _wait_for_worker(cfg, route=None, timeout=0.0)
+        tmp = Path(self._test_dir())
+        cfg = PigeonConfig(cache_root=tmp, namespace="ns")
+        cfg.ensure_dirs()
+        workers = _wait_for_worker(cfg, route=None, timeout=0.0)
         self.assertEqual(workers, [])
 
     def test_wait_for_worker_filters_by_route(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
-            cfg.ensure_dirs()
-            now = now_ts()
-            write_worker_heartbeat(
-                cfg,
-                "worker-a",
-                route="cpu-a",
-                host="h",
-                pid=1,
-                started_at="2026-01-01T00:00:00.000000Z",
-                now=now,
-            )
-            workers = _wait_for_worker(cfg, route="cpu-a", timeout=0.0)
-            missing = _wait_for_worker(cfg, route="cpu-b", timeout=0.0)
+        tmp = Path(self._test_dir())
+        cfg = PigeonConfig(cache_root=tmp, namespace="ns")
+        cfg.ensure_dirs()
+        now = now_ts()
+        write_worker_heartbeat(
+            cfg,
+            "worker-a",
+            route="cpu-a",
+            host="h",
+            pid=1,
+            started_at="2026-01-01T00:00:00.000000Z",
+            now=now,
+        )
+        workers = _wait_for_worker(cfg, route="cpu-a", timeout=0.0)
+        missing = _wait_for_worker(cfg, route="cpu-b", timeout=0.0)
         self.assertEqual(len(workers), 1)
         self.assertEqual(workers[0].get("worker_id"), "worker-a")
         self.assertEqual(missing, [])
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 import os
-import tempfile
 import unittest
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Dict, Iterator
 from unittest import mock
 
 from pigeon.common import PigeonConfig
 from pigeon.config import (
+    _parse_config_bytes,
     active_config_pointer_path,
     config_target_path,
     config_to_toml,
@@ -15,6 +17,7 @@ from pigeon.config import (
     discover_config_path,
     ensure_file_config,
     get_active_config_path,
+    invalidate_config_cache,
     load_file_config,
     refresh_file_config,
     set_active_config_path,
@@ -24,125 +27,175 @@ from pigeon.config import (
     write_file_config,
 )
 
+from _support import TempRootTestCase
 
-class ConfigTests(unittest.TestCase):
+
+_FULL_TOML = "\n".join(
+    [
+        'cache = "/tmp/cache-x"',
+        'namespace = "ns-x"',
+        'route = "route-x"',
+        'user = "user-x"',
+        "",
+        "[interactive]",
+        'command = "bash --noprofile --norc -i"',
+        "source_bashrc = true",
+        "",
+        "[worker]",
+        "max_jobs = 8",
+        "poll_interval = 0.15",
+        "debug = true",
+        'route = "worker-route-x"',
+        "",
+        "[remote_env]",
+        'A = "1"',
+        'B = "2"',
+    ]
+).encode()
+
+_WORKER_TOML = (
+    "\n".join(
+        [
+            'cache = "/tmp/cache-a"',
+            'namespace = "ns-a"',
+            "",
+            "[worker]",
+            "max_jobs = 2",
+            "poll_interval = 0.1",
+            "debug = false",
+        ]
+    )
+    + "\n"
+).encode()
+
+
+@contextmanager
+def _environ(values: Dict[str, str]) -> Iterator[None]:
+    # Plain save/replace/restore of os.environ; cheaper than mock.patch.dict.
+    saved = os.environ.copy()
+    os.environ.clear()
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+class ConfigTests(TempRootTestCase):
     def test_default_config_path_can_be_overridden_by_env(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            p = Path(tmp) / "env.toml"
-            with mock.patch.dict(os.environ, {"HOME": tmp, "PIGEON_CONFIG": str(p)}, clear=True):
-                got = default_config_path()
-        self.assertEqual(got, p.resolve())
+        tmp = self._test_dir()
+        p = Path(tmp) / "env.toml"
+        with _environ({"HOME": tmp, "PIGEON_CONFIG": str(p)}):
+            got = default_config_path()
+        self.assertEqual(got, p)
 
     def test_default_config_path_uses_config_root_env(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            root = Path(tmp) / "shared-root"
-            with mock.patch.dict(
-                os.environ,
-                {"HOME": tmp, "PIGEON_CONFIG_ROOT": str(root)},
-                clear=True,
-            ):
-                got = default_config_path()
-        self.assertEqual(got, (root / "config.toml").resolve())
+        tmp = self._test_dir()
+        root = Path(tmp) / "shared-root"
+        with _environ({"HOME": tmp, "PIGEON_CONFIG_ROOT": str(root)}):
+            got = default_config_path()
+        self.assertEqual(got, root / "config.toml")
 
     def test_default_config_path_can_use_active_pointer(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            active_target = Path(tmp) / "active.toml"
-            active_target.write_text('cache = "/tmp/x"\n', encoding="utf-8")
-            with mock.patch.dict(os.environ, {"HOME": tmp}, clear=True):
-                written = set_active_config_path(active_target)
-                self.assertEqual(written, active_target.resolve())
-                got_active = get_active_config_path()
-                got_default = default_config_path()
-                pointer = active_config_pointer_path()
-                self.assertTrue(pointer.exists())
-        self.assertEqual(got_active, active_target.resolve())
-        self.assertEqual(got_default, active_target.resolve())
+        tmp = self._test_dir()
+        active_target = Path(tmp) / "active.toml"
+        active_target.write_bytes(b'cache = "/tmp/x"\n')
+        with _environ({"HOME": tmp}):
+            written = set_active_config_path(active_target)
+            self.assertEqual(written, active_target)
+            got_active = get_active_config_path()
+            got_default = default_config_path()
+            pointer = active_config_pointer_path()
+            self.assertTrue(pointer.exists())
+        self.assertEqual(got_active, active_target)
+        self.assertEqual(got_default, active_target)
+
+    def test_set_active_config_path_skips_rewrite_when_unchanged(self) -> None:
+        tmp = self._test_dir()
+        target = Path(tmp) / "active.toml"
+        with _environ({"HOME": tmp}):
+            set_active_config_path(target)
+            with mock.patch("pigeon.config.tempfile.mkstemp") as mkstemp:
+                again = set_active_config_path(target)
+            mkstemp.assert_not_called()
+            self.assertEqual(get_active_config_path(), target)
+        self.assertEqual(again, target)
+
+    def test_default_config_path_is_cached_until_pointer_changes(self) -> None:
+        tmp = self._test_dir()
+        first = Path(tmp) / "first.toml"
+        second = Path(tmp) / "second.toml"
+        with _environ({"HOME": tmp}):
+            set_active_config_path(first)
+            self.assertEqual(default_config_path(), first)
+            with mock.patch("pigeon.config.get_active_config_path") as get_active:
+                self.assertEqual(default_config_path(), first)
+            get_active.assert_not_called()
+            set_active_config_path(second)
+            self.assertEqual(default_config_path(), second)
 
     def test_default_config_env_has_priority_over_active_pointer(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            active_target = Path(tmp) / "active.toml"
-            explicit_target = Path(tmp) / "explicit.toml"
-            active_target.write_text('cache = "/tmp/a"\n', encoding="utf-8")
-            explicit_target.write_text('cache = "/tmp/b"\n', encoding="utf-8")
-            with mock.patch.dict(os.environ, {"HOME": tmp}, clear=True):
-                set_active_config_path(active_target)
-            with mock.patch.dict(
-                os.environ,
-                {"HOME": tmp, "PIGEON_CONFIG": str(explicit_target)},
-                clear=True,
-            ):
-                got = default_config_path()
-        self.assertEqual(got, explicit_target.resolve())
+        tmp = self._test_dir()
+        active_target = Path(tmp) / "active.toml"
+        explicit_target = Path(tmp) / "explicit.toml"
+        active_target.write_bytes(b'cache = "/tmp/a"\n')
+        explicit_target.write_bytes(b'cache = "/tmp/b"\n')
+        with _environ({"HOME": tmp}):
+            set_active_config_path(active_target)
+        with _environ({"HOME": tmp, "PIGEON_CONFIG": str(explicit_target)}):
+            got = default_config_path()
+        self.assertEqual(got, explicit_target)
 
     def test_config_target_path_priority(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            explicit = Path(tmp) / "explicit.toml"
-            by_env = Path(tmp) / "env.toml"
-            by_active = Path(tmp) / "active.toml"
-            by_default = Path(tmp) / ".config" / "pigeon" / "config.toml"
-            by_default.parent.mkdir(parents=True, exist_ok=True)
-            with mock.patch.dict(
-                os.environ,
-                {"HOME": tmp, "PIGEON_CONFIG": str(by_env)},
-                clear=True,
-            ):
-                self.assertEqual(config_target_path(str(explicit)), explicit.resolve())
-                self.assertEqual(config_target_path(None), by_env.resolve())
-
-            with mock.patch.dict(os.environ, {"HOME": tmp}, clear=True):
-                set_active_config_path(by_active)
-                self.assertEqual(config_target_path(None), by_active.resolve())
-
-            with mock.patch.dict(os.environ, {"HOME": tmp}, clear=True):
-                pointer = active_config_pointer_path()
-                if pointer.exists():
-                    pointer.unlink()
-                self.assertEqual(config_target_path(None), by_default.resolve())
+        tmp = self._test_dir()
+        explicit = Path(tmp) / "explicit.toml"
+        by_env = Path(tmp) / "env.toml"
+        by_active = Path(tmp) / "active.toml"
+        by_default = Path(tmp) / ".config" / "pigeon" / "config.toml"
+        by_default.parent.mkdir(parents=True, exist_ok=True)
+        with _environ({"HOME": tmp, "PIGEON_CONFIG": str(by_env)}):
+            self.assertEqual(config_target_path(str(explicit)), explicit)
+            self.assertEqual(config_target_path(None), by_env)
+
+        with _environ({"HOME": tmp}):
+            set_active_config_path(by_active)
+            self.assertEqual(config_target_path(None), by_active)
+
+        with _environ({"HOME": tmp}):
+            pointer = active_config_pointer_path()
+            if pointer.exists():
+                pointer.unlink()
+            self.assertEqual(config_target_path(None), by_default)
+
+    def test_config_target_path_normalizes_lexically(self) -> None:
+        tmp = self._test_dir()
+        real = Path(tmp) / "real"
+        real.mkdir()
+        link = Path(tmp) / "link"
+        link.symlink_to(real)
+        got = config_target_path(os.path.join(tmp, "link", "sub", "..", "cfg.toml"))
+        self.assertEqual(got, link / "cfg.toml")
 
     def test_discover_returns_none_if_target_does_not_exist(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            p = Path(tmp) / "default.toml"
-            with mock.patch.dict(os.environ, {"PIGEON_CONFIG": str(p)}, clear=True):
-                found = discover_config_path(None)
+        tmp = self._test_dir()
+        p = Path(tmp) / "default.toml"
+        with _environ({"PIGEON_CONFIG": str(p)}):
+            found = discover_config_path(None)
         self.assertIsNone(found)
 
     def test_discover_ignores_cwd_local_config(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            local_cfg = Path(tmp) / ".pigeon.toml"
-            local_cfg.write_text('cache = "/tmp/local-cwd"\n', encoding="utf-8")
-            with mock.patch.dict(os.environ, {"HOME": tmp}, clear=True):
-                found = discover_config_path(None)
+        tmp = self._test_dir()
+        local_cfg = Path(tmp) / ".pigeon.toml"
+        local_cfg.write_bytes(b'cache = "/tmp/local-cwd"\n')
+        with _environ({"HOME": tmp}):
+            found = discover_config_path(None)
         self.assertIsNone(found)
 
-    def test_load_file_config_parses_fields(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            path = Path(tmp) / "pigeon.toml"
-            path.write_text(
-                "\n".join(
-                    [
-                        'cache = "/tmp/cache-x"',
-                        'namespace = "ns-x"',
-                        'route = "route-x"',
-                        'user = "user-x"',
-                        "",
-                        "[interactive]",
-                        'command = "bash --noprofile --norc -i"',
-                        "source_bashrc = true",
-                        "",
-                        "[worker]",
-                        "max_jobs = 8",
-                        "poll_interval = 0.15",
-                        "debug = true",
-                        'route = "worker-route-x"',
-                        "",
-                        "[remote_env]",
-                        'A = "1"',
-                        'B = "2"',
-                    ]
-                ),
-                encoding="utf-8",
-            )
-            cfg = load_file_config(str(path))
+    def test_parse_config_bytes_parses_fields(self) -> None:
+        path = Path("/nonexistent/pigeon.toml")
+        cfg = _parse_config_bytes(_FULL_TOML, path)
+        self.assertEqual(cfg.path, path)
         self.assertEqual(cfg.cache, "/tmp/cache-x")
         self.assertEqual(cfg.namespace, "ns-x")
         self.assertEqual(cfg.route, "route-x")
@@ -150,109 +203,152 @@ class ConfigTests(unittest.TestCase):
         self.assertEqual(cfg.interactive_command, "bash --noprofile --norc -i")
         self.assertTrue(cfg.interactive_source_bashrc)
         self.assertEqual(cfg.worker_max_jobs, 8)
-        self.assertAlmostEqual(cfg.worker_poll_interval or 0.0, 0.15, places=6)
+        self.assertEqual(cfg.worker_poll_interval, 0.15)
         self.assertEqual(cfg.worker_debug, True)
         self.assertEqual(cfg.worker_route, "worker-route-x")
-        self.assertEqual(cfg.remote_env, {"A": "1", "B": "2"})
+        self.assertEqual(cfg.remote_env, (("A", "1"), ("B", "2")))
+
+    def test_load_file_config_reuses_parse_until_file_changes(self) -> None:
+        tmp = self._test_dir()
+        path = Path(tmp) / "pigeon.toml"
+        path.write_bytes(b'cache = "/tmp/a"\n')
+        first = load_file_config(str(path))
+        self.assertIs(load_file_config(str(path)), first)
+        write_file_config(set_config_value(first, "cache", "/tmp/b"))
+        second = load_file_config(str(path))
+        self.assertEqual(second.cache, "/tmp/b")
+        invalidate_config_cache()
+        self.assertIsNot(load_file_config(str(path)), second)
+
+    def test_ensure_file_config_shares_parse_cache_with_load(self) -> None:
+        target = Path(self._test_dir()) / "cfg.toml"
+        target.write_bytes(b'cache = "/tmp/a"\n')
+        cfg, created = ensure_file_config(str(target))
+        self.assertFalse(created)
+        self.assertIs(load_file_config(str(target)), cfg)
+
+    def test_load_file_config_reports_undecodable_file_as_invalid_toml(self) -> None:
+        tmp = self._test_dir()
+        path = Path(tmp) / "pigeon.toml"
+        path.write_bytes(b'cache = "\xff"\n')
+        with self.assertRaisesRegex(RuntimeError, "invalid TOML"):
+            load_file_config(str(path))
+
+    def test_load_file_config_under_regular_file_is_missing(self) -> None:
+        tmp = self._test_dir()
+        parent = Path(tmp) / "plain-file"
+        parent.write_bytes(b"")
+        p = parent / "cfg.toml"
+        cfg = load_file_config(str(p))
+        self.assertEqual(cfg.path, p)
+        self.assertIsNone(cfg.cache)
 
     def test_load_file_config_missing_returns_empty_with_target_path(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            p = Path(tmp) / "not-exist.toml"
-            cfg = load_file_config(str(p))
-        self.assertEqual(cfg.path, p.resolve())
+        tmp = self._test_dir()
+        p = Path(tmp) / "not-exist.toml"
+        cfg = load_file_config(str(p))
+        self.assertEqual(cfg.path, p)
         self.assertIsNone(cfg.cache)
         self.assertIsNone(cfg.interactive_command)
         self.assertIsNone(cfg.interactive_source_bashrc)
-        self.assertEqual(cfg.remote_env, {})
+        self.assertEqual(cfg.remote_env, ())
 
     def test_common_config_precedence_file_over_env(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            path = Path(tmp) / "pigeon.toml"
-            path.write_text('cache = "/tmp/cache-from-file"\nnamespace = "ns-file"\nuser = "u-file"\n', encoding="utf-8")
-            file_cfg = load_file_config(str(path))
-            with mock.patch.dict(
-                os.environ,
-                {
-                    "PIGEON_CACHE": "/tmp/cache-from-env",
-                    "PIGEON_NAMESPACE": "ns-env",
-                    "USER": "u-env",
-                },
-                clear=True,
-            ):
-                cfg = PigeonConfig.from_sources(file_cfg)
+        tmp = self._test_dir()
+        path = Path(tmp) / "pigeon.toml"
+        path.write_bytes(b'cache = "/tmp/cache-from-file"\nnamespace = "ns-file"\nuser = "u-file"\n')
+        file_cfg = load_file_config(str(path))
+        with _environ(
+            {
+                "PIGEON_CACHE": "/tmp/cache-from-env",
+                "PIGEON_NAMESPACE": "ns-env",
+                "USER": "u-env",
+            },
+        ):
+            cfg = PigeonConfig.from_sources(file_cfg)
         self.assertEqual(str(cfg.cache_root), "/tmp/cache-from-file")
         self.assertEqual(cfg.namespace, "ns-file")
 
     def test_common_config_fallback_to_file(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            path = Path(tmp) / "pigeon.toml"
-            path.write_text('cache = "/tmp/cache-from-file"\nnamespace = "ns-file"\n', encoding="utf-8")
-            file_cfg = load_file_config(str(path))
-            with mock.patch.dict(os.environ, {}, clear=True):
-                cfg = PigeonConfig.from_sources(file_cfg)
+        tmp = self._test_dir()
+        path = Path(tmp) / "pigeon.toml"
+        path.write_bytes(b'cache = "/tmp/cache-from-file"\nnamespace = "ns-file"\n')
+        file_cfg = load_file_config(str(path))
+        with _environ({}):
+            cfg = PigeonConfig.from_sources(file_cfg)
         self.assertEqual(str(cfg.cache_root), "/tmp/cache-from-file")
         self.assertEqual(cfg.namespace, "ns-file")
 
     def test_set_unset_and_write_config(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            p = Path(tmp) / "cfg.toml"
-            cfg = load_file_config(str(p))
-            cfg = set_config_value(cfg, "cache", "/tmp/cache-z")
-            cfg = set_config_value(cfg, "interactive.command", "bash -l -i")
-            cfg = set_config_value(cfg, "interactive.source_bashrc", "true")
-            cfg = set_config_value(cfg, "worker.max_jobs", "7")
-            cfg = set_config_value(cfg, "worker.debug", "true")
-            cfg = set_config_value(cfg, "remote_env.HTTPS_PROXY", "http://proxy:8080")
-            out_path = write_file_config(cfg)
-            self.assertEqual(out_path, p.resolve())
-            loaded = load_file_config(str(p))
+        tmp = self._test_dir()
+        p = Path(tmp) / "cfg.toml"
+        cfg = load_file_config(str(p))
+        cfg = set_config_value(cfg, "cache", "/tmp/cache-z")
+        cfg = set_config_value(cfg, "interactive.command", "bash -l -i")
+        cfg = set_config_value(cfg, "interactive.source_bashrc", "true")
+        cfg = set_config_value(cfg, "worker.max_jobs", "7")
+        cfg = set_config_value(cfg, "worker.debug", "true")
+        cfg = set_config_value(cfg, "remote_env.HTTPS_PROXY", "http://proxy:8080")
+        out_path = write_file_config(cfg)
+        self.assertEqual(out_path, p)
+        loaded = load_file_config(str(p))
         self.assertEqual(loaded.cache, "/tmp/cache-z")
         self.assertEqual(loaded.interactive_command, "bash -l -i")
         self.assertTrue(loaded.interactive_source_bashrc)
         self.assertEqual(loaded.worker_max_jobs, 7)
         self.assertTrue(loaded.worker_debug)
-        self.assertEqual(loaded.remote_env["HTTPS_PROXY"], "http://proxy:8080")
+        self.assertEqual(dict(loaded.remote_env)["HTTPS_PROXY"], "http://proxy:8080")
         loaded = unset_config_value(loaded, "worker.max_jobs")
         self.assertIsNone(loaded.worker_max_jobs)
 
+    def test_set_config_value_validates_remote_env_key(self) -> None:
+        tmp = self._test_dir()
+        cfg = load_file_config(str(Path(tmp) / "cfg.toml"))
+        cfg = set_config_value(cfg, "remote_env. HTTP_PROXY ", "http://proxy:8080")
+        self.assertEqual(cfg.remote_env, (("HTTP_PROXY", "http://proxy:8080"),))
+        cfg = unset_config_value(cfg, "remote_env.HTTP_PROXY")
+        self.assertEqual(cfg.remote_env, ())
+        with self.assertRaises(RuntimeError):
+            set_config_value(cfg, "remote_env.1BAD", "x")
+        with self.assertRaises(RuntimeError):
+            unset_config_value(cfg, "remote_env.BAD-KEY")
+
     def test_config_to_toml_empty(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            cfg = load_file_config(str(Path(tmp) / "x.toml"))
+        tmp = self._test_dir()
+        cfg = load_file_config(str(Path(tmp) / "x.toml"))
         self.assertEqual(config_to_toml(cfg), "")
 
     def test_ensure_file_config_creates_default_values(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            target = Path(tmp) / "cfg.toml"
-            with mock.patch.dict(os.environ, {"USER": "alice"}, clear=True):
-                cfg, created = ensure_file_config(str(target))
-                loaded = load_file_config(str(target))
-            self.assertTrue(target.exists())
+        tmp = self._test_dir()
+        target = Path(tmp) / "cfg.toml"
+        with _environ({"USER": "alice"}):
+            cfg, created = ensure_file_config(str(target))
+            loaded = load_file_config(str(target))
+        self.assertTrue(target.exists())
         self.assertTrue(created)
-        self.assertEqual(cfg.path, target.resolve())
+        self.assertEqual(cfg.path, target)
         self.assertEqual(loaded.cache, "/tmp/pigeon-cache")
         self.assertEqual(loaded.namespace, "alice")
         self.assertEqual(loaded.user, "alice")
         self.assertEqual(loaded.worker_max_jobs, 4)
-        self.assertAlmostEqual(loaded.worker_poll_interval or 0.0, 0.05, places=6)
+        self.assertEqual(loaded.worker_poll_interval, 0.05)
         self.assertFalse(loaded.worker_debug)
-        self.assertEqual(loaded.remote_env, {})
+        self.assertEqual(loaded.remote_env, ())
 
     def test_ensure_file_config_respects_env_defaults(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            target = Path(tmp) / "cfg.toml"
-            with mock.patch.dict(
-                os.environ,
-                {
-                    "PIGEON_CACHE": "/shared/pigeon-cache",
-                    "PIGEON_NAMESPACE": "ns-env",
-                    "PIGEON_USER": "u-env",
-                    "PIGEON_ROUTE": "route-env",
-                    "PIGEON_WORKER_ROUTE": "worker-route-env",
-                },
-                clear=True,
-            ):
-                _, created = ensure_file_config(str(target))
-                loaded = load_file_config(str(target))
+        tmp = self._test_dir()
+        target = Path(tmp) / "cfg.toml"
+        with _environ(
+            {
+                "PIGEON_CACHE": "/shared/pigeon-cache",
+                "PIGEON_NAMESPACE": "ns-env",
+                "PIGEON_USER": "u-env",
+                "PIGEON_ROUTE": "route-env",
+                "PIGEON_WORKER_ROUTE": "worker-route-env",
+            },
+        ):
+            _, created = ensure_file_config(str(target))
+            loaded = load_file_config(str(target))
         self.assertTrue(created)
         self.assertEqual(loaded.cache, "/shared/pigeon-cache")
         self.assertEqual(loaded.namespace, "ns-env")
@@ -261,112 +357,92 @@ class ConfigTests(unittest.TestCase):
         self.assertEqual(loaded.worker_route, "worker-route-env")
 
     def test_ensure_file_config_respects_interactive_env_defaults(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            target = Path(tmp) / "cfg.toml"
-            with mock.patch.dict(
-                os.environ,
-                {
-                    "PIGEON_INTERACTIVE_COMMAND": "bash -l -i",
-                    "PIGEON_INTERACTIVE_SOURCE_BASHRC": "true",
-                },
-                clear=True,
-            ):
-                _, created = ensure_file_config(str(target))
-                loaded = load_file_config(str(target))
+        tmp = self._test_dir()
+        target = Path(tmp) / "cfg.toml"
+        with _environ(
+            {
+                "PIGEON_INTERACTIVE_COMMAND": "bash -l -i",
+                "PIGEON_INTERACTIVE_SOURCE_BASHRC": "true",
+            },
+        ):
+            _, created = ensure_file_config(str(target))
+            loaded = load_file_config(str(target))
         self.assertTrue(created)
         self.assertEqual(loaded.interactive_command, "bash -l -i")
         self.assertTrue(loaded.interactive_source_bashrc)
 
     def test_ensure_file_config_respects_worker_env_defaults(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            target = Path(tmp) / "cfg.toml"
-            with mock.patch.dict(
-                os.environ,
-                {
-                    "PIGEON_WORKER_MAX_JOBS": "9",
-                    "PIGEON_WORKER_POLL_INTERVAL": "0.35",
-                    "PIGEON_WORKER_DEBUG": "true",
-                },
-                clear=True,
-            ):
-                _, created = ensure_file_config(str(target))
-                loaded = load_file_config(str(target))
+        tmp = self._test_dir()
+        target = Path(tmp) / "cfg.toml"
+        with _environ(
+            {
+                "PIGEON_WORKER_MAX_JOBS": "9",
+                "PIGEON_WORKER_POLL_INTERVAL": "0.35",
+                "PIGEON_WORKER_DEBUG": "true",
+            },
+        ):
+            _, created = ensure_file_config(str(target))
+            loaded = load_file_config(str(target))
         self.assertTrue(created)
         self.assertEqual(loaded.worker_max_jobs, 9)
-        self.assertAlmostEqual(loaded.worker_poll_interval or 0.0, 0.35, places=6)
+        self.assertEqual(loaded.worker_poll_interval, 0.35)
         self.assertTrue(loaded.worker_debug)
 
     def test_ensure_file_config_does_not_overwrite_existing_file(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            target = Path(tmp) / "cfg.toml"
-            target.write_text('cache = "/from/file"\nnamespace = "ns-file"\n', encoding="utf-8")
-            with mock.patch.dict(os.environ, {"PIGEON_CACHE": "/from/env"}, clear=True):
-                loaded, created = ensure_file_config(str(target))
+        tmp = self._test_dir()
+        target = Path(tmp) / "cfg.toml"
+        target.write_bytes(b'cache = "/from/file"\nnamespace = "ns-file"\n')
+        with _environ({"PIGEON_CACHE": "/from/env"}):
+            loaded, created = ensure_file_config(str(target))
         self.assertFalse(created)
         self.assertEqual(loaded.cache, "/from/file")
         self.assertEqual(loaded.namespace, "ns-file")
 
     def test_refresh_file_config_fills_missing_defaults(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            target = Path(tmp) / "cfg.toml"
-            target.write_text('cache = "/from-file"\n', encoding="utf-8")
-            with mock.patch.dict(os.environ, {"USER": "refresh-user"}, clear=True):
-                refreshed, created, changed = refresh_file_config(str(target))
-            loaded = load_file_config(str(target))
+        tmp = self._test_dir()
+        target = Path(tmp) / "cfg.toml"
+        target.write_bytes(b'cache = "/from-file"\n')
+        with _environ({"USER": "refresh-user"}):
+            refreshed, created, changed = refresh_file_config(str(target))
+        loaded = load_file_config(str(target))
         self.assertFalse(created)
         self.assertTrue(changed)
-        self.assertEqual(refreshed.path, target.resolve())
+        self.assertEqual(refreshed.path, target)
         self.assertEqual(loaded.cache, "/from-file")
         self.assertEqual(loaded.namespace, "refresh-user")
         self.assertEqual(loaded.user, "refresh-user")
         self.assertEqual(loaded.interactive_command, "bash --noprofile --norc -i")
         self.assertFalse(loaded.interactive_source_bashrc)
         self.assertEqual(loaded.worker_max_jobs, 4)
-        self.assertAlmostEqual(loaded.worker_poll_interval or 0.0, 0.05, places=6)
+        self.assertEqual(loaded.worker_poll_interval, 0.05)
         self.assertFalse(loaded.worker_debug)
 
     def test_sync_env_to_file_config_updates_worker_fields(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp:
-            target = Path(tmp) / "cfg.toml"
-            target.write_text(
-                "\n".join(
-                    [
-                        'cache = "/tmp/cache-a"',
-                        'namespace = "ns-a"',
-                        "",
-                        "[worker]",
-                        "max_jobs = 2",
-                        "poll_interval = 0.1",
-                        "debug = false",
-                    ]
-                )
-                + "\n",
-                encoding="utf-8",
-            )
-            with mock.patch.dict(
-                os.environ,
-                {
-                    "PIGEON_WORKER_MAX_JOBS": "11",
-                    "PIGEON_WORKER_POLL_INTERVAL": "0.45",
-                    "PIGEON_WORKER_DEBUG": "on",
-                    "PIGEON_INTERACTIVE_COMMAND": "bash -l -i",
-                    "PIGEON_INTERACTIVE_SOURCE_BASHRC": "yes",
-                },
-                clear=True,
-            ):
-                updated, created, changed = sync_env_to_file_config(str(target))
-                loaded = load_file_config(str(target))
+        tmp = self._test_dir()
+        target = Path(tmp) / "cfg.toml"
+        target.write_bytes(_WORKER_TOML)
+        with _environ(
+            {
+                "PIGEON_WORKER_MAX_JOBS": "11",
+                "PIGEON_WORKER_POLL_INTERVAL": "0.45",
+                "PIGEON_WORKER_DEBUG": "on",
+                "PIGEON_INTERACTIVE_COMMAND": "bash -l -i",
+                "PIGEON_INTERACTIVE_SOURCE_BASHRC": "yes",
+            },
+        ):
+            updated, created, changed = sync_env_to_file_config(str(target))
+            loaded = load_file_config(str(target))
         self.assertFalse(created)
         self.assertTrue(changed)
         self.assertEqual(updated.interactive_command, "bash -l -i")
         self.assertTrue(updated.interactive_source_bashrc)
         self.assertEqual(updated.worker_max_jobs, 11)
-        self.assertAlmostEqual(updated.worker_poll_interval or 0.0, 0.45, places=6)
+        self.assertEqual(updated.worker_poll_interval, 0.45)
         self.assertTrue(updated.worker_debug)
         self.assertEqual(loaded.interactive_command, "bash -l -i")
         self.assertTrue(loaded.interactive_source_bashrc)
         self.assertEqual(loaded.worker_max_jobs, 11)
-        self.assertAlmostEqual(loaded.worker_poll_interval or 0.0, 0.45, places=6)
+        self.assertEqual(loaded.worker_poll_interval, 0.45)
         self.assertTrue(loaded.worker_debug)
 
 
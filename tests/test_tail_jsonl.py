@@ -1,49 +1,131 @@
 from __future__ import annotations
 
+import os
 import tempfile
 import unittest
 from pathlib import Path
-from typing import Dict, List
+from unittest import mock
 
-from pigeon.common import tail_jsonl
+from pigeon.common import (
+    TAIL_KEEP_OPEN_ENV,
+    JsonlAppender,
+    JsonlTailer,
+    append_jsonl,
+    atomic_write_json,
+    read_json,
+    split_jsonl,
+)
 
 
-def _collect(path: Path, offset: int) -> tuple[int, List[Dict[str, object]]]:
-    new_offset, it = tail_jsonl(path, offset)
-    return new_offset, list(it)
+class JsonlWriterTests(unittest.TestCase):
+    def test_appender_lines_interleave_with_append_jsonl(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            p = Path(tmp) / "sub" / "events.jsonl"
+            with JsonlAppender(p) as out:
+                out.append({"a": 1})
+                append_jsonl(p, {"b": 2})
+                out.append({"c": "\u00e9"})
 
+            tail = JsonlTailer(p)
+            self.assertEqual(tail.poll(), [{"a": 1}, {"b": 2}, {"c": "\u00e9"}])
+            self.assertEqual(tail.offset, p.stat().st_size)
 
-class TailJsonlTests(unittest.TestCase):
-    def test_partial_line_is_not_dropped(self) -> None:
+    def test_writers_create_missing_parent_dirs(self) -> None:
         with tempfile.TemporaryDirectory() as tmp:
-            p = Path(tmp) / "events.jsonl"
-            p.write_text('{"k":1', encoding="utf-8")
+            p = Path(tmp) / "a" / "events.jsonl"
+            append_jsonl(p, {"a": 1})
+            doc = Path(tmp) / "b" / "c" / "status.json"
+            atomic_write_json(doc, {"state": "pending"})
+            self.assertEqual(JsonlTailer(p).poll(), [{"a": 1}])
+            self.assertEqual(read_json(doc), {"state": "pending"})
 
-            off, records = _collect(p, 0)
-            self.assertEqual(off, 0)
-            self.assertEqual(records, [])
 
-            with p.open("a", encoding="utf-8") as fh:
-                fh.write("}\n")
+class SplitJsonlTests(unittest.TestCase):
+    def test_mixed_complete_and_partial_lines_preserve_tail(self) -> None:
+        data = b'{"a":1}\n{"b":2'
+        consumed, records = split_jsonl(data)
+        self.assertEqual(records, [{"a": 1}])
+        self.assertEqual(data[consumed:], b'{"b":2')
+        self.assertEqual(split_jsonl(data[consumed:] + b"}\n"), (len(b'{"b":2}\n'), [{"b": 2}]))
 
-            off, records = _collect(p, off)
-            self.assertEqual(records, [{"k": 1}])
-            self.assertEqual(off, p.stat().st_size)
+    def test_offsets_are_bytes_for_non_ascii_records(self) -> None:
+        data = '{"s":"\u00e9\u00e9"}\n{"t":'.encode("utf-8")
+        consumed, records = split_jsonl(data)
+        self.assertEqual(records, [{"s": "\u00e9\u00e9"}])
+        self.assertEqual(consumed, len('{"s":"\u00e9\u00e9"}\n'.encode("utf-8")))
 
-    def test_mixed_complete_and_partial_lines_preserve_tail(self) -> None:
+    def test_blank_and_undecodable_lines_are_skipped(self) -> None:
+        data = b'\n{oops\n{"a":1}\n'
+        self.assertEqual(split_jsonl(data), (len(data), [{"a": 1}]))
+        self.assertEqual(split_jsonl(b""), (0, []))
+
+
+class JsonlTailerTests(unittest.TestCase):
+    def test_tailer_waits_for_file_and_holds_partial_line(self) -> None:
         with tempfile.TemporaryDirectory() as tmp:
             p = Path(tmp) / "events.jsonl"
-            p.write_text('{"a":1}\n{"b":2', encoding="utf-8")
+            tail = JsonlTailer(p)
+            self.assertEqual(tail.poll(), [])
+            p.write_bytes(b'{"a":1}\n{"b":')
+            self.assertEqual(tail.poll(), [{"a": 1}])
+            self.assertEqual(tail.offset, len(b'{"a":1}\n'))
+            self.assertEqual(tail.poll(), [])
+            with p.open("ab") as fh:
+                fh.write(b'2}\n')
+            self.assertEqual(tail.poll(), [{"b": 2}])
+            self.assertEqual(tail.offset, p.stat().st_size)
 
-            off, records = _collect(p, 0)
-            self.assertEqual(records, [{"a": 1}])
+    def test_tailer_restarts_after_truncation(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            p = Path(tmp) / "events.jsonl"
+            append_jsonl(p, {"a": 1})
+            append_jsonl(p, {"b": 2})
+            tail = JsonlTailer(p)
+            self.assertEqual(tail.poll(), [{"a": 1}, {"b": 2}])
+            p.write_bytes(b"")
+            append_jsonl(p, {"c": 3})
+            self.assertEqual(tail.poll(), [{"c": 3}])
 
-            with p.open("a", encoding="utf-8") as fh:
-                fh.write("}\n")
+    def test_tailer_keeps_one_fd_when_enabled(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            p = Path(tmp) / "events.jsonl"
+            append_jsonl(p, {"a": 1})
+            with mock.patch.dict(os.environ, {TAIL_KEEP_OPEN_ENV: "1"}):
+                tail = JsonlTailer(p)
+            with mock.patch("pigeon.common.os.open", wraps=os.open) as open_mock:
+                with tail:
+                    self.assertEqual(tail.poll(), [{"a": 1}])
+                    append_jsonl(p, {"b": 2})
+                    self.assertEqual(tail.poll(), [{"b": 2}])
+                    self.assertEqual(tail.poll(), [])
+                    self.assertIsNotNone(tail._fd)
+                self.assertIsNone(tail._fd)
+            open_mock.assert_called_once()
 
-            off, records = _collect(p, off)
-            self.assertEqual(records, [{"b": 2}])
-            self.assertEqual(off, p.stat().st_size)
+    def test_idle_poll_skips_read_only_with_kept_fd(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            p = Path(tmp) / "events.jsonl"
+            append_jsonl(p, {"a": 1})
+            for keep_open, reads in (("1", 0), ("", 1)):
+                with mock.patch.dict(os.environ, {TAIL_KEEP_OPEN_ENV: keep_open}):
+                    tail = JsonlTailer(p)
+                with tail:
+                    self.assertEqual(tail.poll(), [{"a": 1}])
+                    with mock.patch("pigeon.common.os.pread", wraps=os.pread) as pread_mock:
+                        self.assertEqual(tail.poll(), [])
+                self.assertEqual(pread_mock.call_count, reads)
+
+    def test_tailer_reads_past_one_read_chunk(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            p = Path(tmp) / "events.jsonl"
+            tail = JsonlTailer(p)
+            with JsonlAppender(p) as out:
+                for i in range(20000):
+                    out.append({"i": i})
+            records = tail.poll()
+            self.assertEqual(len(records), 20000)
+            self.assertEqual(records[-1], {"i": 19999})
+            self.assertEqual(tail.offset, p.stat().st_size)
 
 
 if __name__ == "__main__":
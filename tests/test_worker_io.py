@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import os
+import signal
+import unittest
+from unittest import mock
+
+from pigeon.worker import _apply_control, _drain_fd, _write_pty_input
+
+
+def _read_all(fd: int) -> bytes:
+    chunks = []
+    while True:
+        try:
+            chunk = os.read(fd, 1 << 16)
+        except BlockingIOError:
+            break
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class WorkerIoTests(unittest.TestCase):
+    def setUp(self) -> None:
+        # A non-blocking pipe stands in for the PTY master: writes come up
+        # short once its buffer is full, just like the child's input queue.
+        self.r, self.w = os.pipe()
+        os.set_blocking(self.r, False)
+        os.set_blocking(self.w, False)
+        self.addCleanup(self._close)
+
+    def _close(self) -> None:
+        for fd in (self.r, self.w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def test_short_write_keeps_the_rest_queued(self) -> None:
+        payload = os.urandom(1 << 20)
+        pending = bytearray(payload)
+        self.assertFalse(_write_pty_input(self.w, pending, False))
+        self.assertTrue(0 < len(pending) < len(payload))
+        received = _read_all(self.r)
+        self.assertEqual(received, payload[: len(received)])
+        while pending:
+            _write_pty_input(self.w, pending, False)
+            received += _read_all(self.r)
+        self.assertEqual(received, payload)
+
+    def test_eof_waits_for_pending_input(self) -> None:
+        payload = b"x" * (1 << 20)
+        pending = bytearray(payload)
+        self.assertTrue(_write_pty_input(self.w, pending, True))
+        received = _read_all(self.r)
+        self.assertNotIn(b"\x04", received)
+        eof_pending = True
+        while eof_pending:
+            eof_pending = _write_pty_input(self.w, pending, eof_pending)
+            received += _read_all(self.r)
+        self.assertEqual(received, payload + b"\x04")
+
+    def test_write_to_closed_reader_drops_the_queue(self) -> None:
+        os.close(self.r)
+        pending = bytearray(b"lost\n")
+        self.assertFalse(_write_pty_input(self.w, pending, True))
+        self.assertEqual(pending, bytearray())
+
+    def test_drain_splits_data_larger_than_the_buffer(self) -> None:
+        payload = bytes(range(256)) * 4
+        os.write(self.w, payload)
+        buf = memoryview(bytearray(300))
+        chunks = []
+        while True:
+            chunk, eof = _drain_fd(self.r, buf, strict=False)
+            self.assertFalse(eof)
+            if not chunk:
+                break
+            self.assertLessEqual(len(chunk), len(buf))
+            chunks.append(bytes(chunk))
+        self.assertEqual(b"".join(chunks), payload)
+        self.assertEqual(len(chunks), 4)
+        os.close(self.w)
+        self.assertEqual(_drain_fd(self.r, buf, strict=False), (b"", True))
+
+
+class ApplyControlTests(unittest.TestCase):
+    def test_every_signal_is_delivered_and_repeated_resizes_collapse(self) -> None:
+        records = [
+            {"type": "signal", "signal": int(signal.SIGINT)},
+            {"type": "resize", "cols": 80, "rows": 24},
+            {"type": "resize", "cols": 80, "rows": 24},
+            {"type": "signal", "signal": int(signal.SIGINT)},
+            {"type": "resize", "cols": 100, "rows": 30},
+        ]
+        with mock.patch("pigeon.worker.os.killpg") as killpg, mock.patch("pigeon.worker._set_winsize") as winsize:
+            _apply_control(records, 1234, 7, "sid", False)
+        self.assertEqual(killpg.call_args_list, [mock.call(1234, signal.SIGINT)] * 2)
+        self.assertEqual(
+            winsize.call_args_list,
+            [mock.call(7, rows=24, cols=80), mock.call(7, rows=30, cols=100)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,29 +1,65 @@
 from __future__ import annotations
 
+import os
 import tempfile
+import time
 import unittest
+from collections import namedtuple
+from dataclasses import replace
 from pathlib import Path
+from typing import List, Optional, Tuple
 from unittest import mock
 
 from pigeon.common import (
     PigeonConfig,
+    atomic_write_json,
     discover_active_workers,
     now_ts,
+    read_json,
+    request_path,
     route_matches,
+    status_path,
+    utc_iso,
     write_worker_heartbeat,
 )
-from pigeon.config import FileConfig
+from pigeon.config import _EMPTY_FILE_CONFIG, FileConfig
 from pigeon.worker import (
+    _CWD_THREAD_LOCKS,
+    _SessionStatus,
     _build_child_env,
+    _cwd_thread_lock,
+    _discover_pending,
     _downgrade_interactive_shell_flag,
     _normalize_route,
     _resolve_worker_debug,
     _resolve_worker_poll_interval,
     _resolve_worker_route,
     _route_matches,
+    _stat_stamp,
 )
 
 
+# Stands in for the parsed worker CLI args; the resolvers only getattr() them.
+_Args = namedtuple("_Args", ["route", "poll_interval", "debug"])
+
+
+def _cfg_with_workers(tmp: str, workers: List[Tuple[str, Optional[str], float]]) -> PigeonConfig:
+    """Create the namespace dirs once and write a heartbeat per (worker_id, route, now)."""
+    cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
+    cfg.ensure_dirs()
+    for pid, (worker_id, route, now) in enumerate(workers, start=1):
+        write_worker_heartbeat(
+            cfg,
+            worker_id,
+            route=route,
+            host="h",
+            pid=pid,
+            started_at="2026-01-01T00:00:00.000000Z",
+            now=now,
+        )
+    return cfg
+
+
 class WorkerRoutingTests(unittest.TestCase):
     def test_build_child_env_sanitizes_sandbox_vars(self) -> None:
         with mock.patch.dict(
@@ -84,30 +120,15 @@ class WorkerRoutingTests(unittest.TestCase):
             _downgrade_interactive_shell_flag(["bash", "-lc", "echo hi"]),
             ["bash", "-lc", "echo hi"],
         )
+        self.assertEqual(
+            _downgrade_interactive_shell_flag(["bash", "-xic", "echo hi"]),
+            ["bash", "-xc", "echo hi"],
+        )
 
     def test_discover_active_workers_respects_route(self) -> None:
         with tempfile.TemporaryDirectory() as tmp:
-            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
-            cfg.ensure_dirs()
             now = now_ts()
-            write_worker_heartbeat(
-                cfg,
-                "worker-default",
-                route=None,
-                host="h",
-                pid=1,
-                started_at="2026-01-01T00:00:00.000000Z",
-                now=now,
-            )
-            write_worker_heartbeat(
-                cfg,
-                "worker-a",
-                route="cpu-a",
-                host="h",
-                pid=2,
-                started_at="2026-01-01T00:00:00.000000Z",
-                now=now,
-            )
+            cfg = _cfg_with_workers(tmp, [("worker-default", None, now), ("worker-a", "cpu-a", now)])
             default_workers = discover_active_workers(cfg, None, now=now, stale_after=3.0)
             route_workers = discover_active_workers(cfg, "cpu-a", now=now, stale_after=3.0)
 
@@ -118,49 +139,156 @@ class WorkerRoutingTests(unittest.TestCase):
 
     def test_discover_active_workers_ignores_stale(self) -> None:
         with tempfile.TemporaryDirectory() as tmp:
-            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
-            cfg.ensure_dirs()
             now = now_ts()
-            write_worker_heartbeat(
-                cfg,
-                "worker-stale",
-                route=None,
-                host="h",
-                pid=1,
-                started_at="2026-01-01T00:00:00.000000Z",
-                now=now - 60.0,
-            )
+            cfg = _cfg_with_workers(tmp, [("worker-stale", None, now - 60.0)])
             active = discover_active_workers(cfg, None, now=now, stale_after=3.0)
         self.assertEqual(active, [])
 
+    def test_discover_active_workers_skips_non_heartbeat_entries(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            missing = PigeonConfig(cache_root=Path(tmp) / "missing", namespace="ns")
+            self.assertEqual(discover_active_workers(missing, None), [])
+            now = now_ts()
+            cfg = _cfg_with_workers(tmp, [("worker-a", None, now)])
+            (cfg.workers_dir / ".tmp-partial").write_bytes(b'{"route":')
+            (cfg.workers_dir / "nested.json").mkdir()
+            workers = discover_active_workers(cfg, None, now=now)
+        self.assertEqual([w.get("worker_id") for w in workers], ["worker-a"])
+
+    def test_worker_heartbeat_is_written_without_fsync(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            with mock.patch("pigeon.common.os.fsync") as fsync:
+                cfg = _cfg_with_workers(tmp, [("worker-a", "cpu-a", now_ts())])
+            fsync.assert_not_called()
+            workers = discover_active_workers(cfg, "cpu-a")
+        self.assertEqual([w.get("worker_id") for w in workers], ["worker-a"])
+
+    def test_discover_pending_filters_state_and_route(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
+            cfg.ensure_dirs()
+            sessions = {
+                "1-pending-a": ("pending", "cpu-a"),
+                "2-pending-b": ("pending", "cpu-b"),
+                "3-running-a": ("running", "cpu-a"),
+                "4-pending-a": ("pending", "cpu-a"),
+            }
+            for sid, (state, route) in sessions.items():
+                atomic_write_json(request_path(cfg, sid), {"session_id": sid, "route": route})
+                atomic_write_json(status_path(cfg, sid), {"session_id": sid, "state": state})
+            # Status present but request not yet written: not claimable.
+            atomic_write_json(status_path(cfg, "5-no-request"), {"state": "pending"})
+            pending = _discover_pending(cfg, "cpu-a")
+        self.assertEqual(pending, ["1-pending-a", "4-pending-a"])
+
+    def test_discover_pending_sees_status_changes_after_caching(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
+            cfg.ensure_dirs()
+            atomic_write_json(request_path(cfg, "sid"), {"session_id": "sid", "route": None})
+            atomic_write_json(status_path(cfg, "sid"), {"session_id": "sid", "state": "pending"})
+            self.assertEqual(_discover_pending(cfg, None), ["sid"])
+            atomic_write_json(status_path(cfg, "sid"), {"session_id": "sid", "state": "running"})
+            self.assertEqual(_discover_pending(cfg, None), [])
+            with mock.patch("pigeon.worker.read_json", side_effect=AssertionError("re-read")):
+                self.assertEqual(_discover_pending(cfg, None), [])
+
+    def test_discover_pending_stops_statting_sessions_past_pending(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
+            cfg.ensure_dirs()
+            for sid, state in (("done", "succeeded"), ("wait", "pending")):
+                atomic_write_json(request_path(cfg, sid), {"session_id": sid, "route": None})
+                atomic_write_json(status_path(cfg, sid), {"session_id": sid, "state": state})
+            self.assertEqual(_discover_pending(cfg, None), ["wait"])
+            with mock.patch("pigeon.worker._stat_stamp", wraps=_stat_stamp) as stat_mock:
+                self.assertEqual(_discover_pending(cfg, None), ["wait"])
+            statted = {Path(c.args[0]).parent.name for c in stat_mock.call_args_list}
+            self.assertNotIn("done", statted)
+            self.assertIn("wait", statted)
+
+    def test_discover_pending_skips_scan_of_quiet_dir(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
+            cfg.ensure_dirs()
+            atomic_write_json(request_path(cfg, "old"), {"session_id": "old", "route": None})
+            atomic_write_json(status_path(cfg, "old"), {"session_id": "old", "state": "succeeded"})
+            self.assertEqual(_discover_pending(cfg, None), [])
+            with mock.patch("pigeon.worker.os.scandir", side_effect=AssertionError("rescanned")):
+                self.assertEqual(_discover_pending(cfg, None), [])
+            atomic_write_json(request_path(cfg, "new"), {"session_id": "new", "route": None})
+            atomic_write_json(status_path(cfg, "new"), {"session_id": "new", "state": "pending"})
+            self.assertEqual(_discover_pending(cfg, None), ["new"])
+
+    def test_discover_pending_rescans_quiet_dir_after_interval(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
+            cfg.ensure_dirs()
+            atomic_write_json(request_path(cfg, "old"), {"session_id": "old", "route": None})
+            atomic_write_json(status_path(cfg, "old"), {"session_id": "old", "state": "succeeded"})
+            self.assertEqual(_discover_pending(cfg, None), [])
+            later = time.monotonic() + 60.0
+            with mock.patch("pigeon.worker.time.monotonic", return_value=later):
+                with mock.patch("pigeon.worker.os.scandir", wraps=os.scandir) as scandir_mock:
+                    self.assertEqual(_discover_pending(cfg, None), [])
+            scandir_mock.assert_called_once()
+
+    def test_discover_pending_without_sessions_dir(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
+            self.assertEqual(_discover_pending(cfg, None), [])
+
+    def test_cwd_thread_lock_is_dropped_when_unused(self) -> None:
+        lock = Path("/nonexistent/cwd.lock")
+        with _cwd_thread_lock(lock):
+            entry = _CWD_THREAD_LOCKS[lock]
+            self.assertTrue(entry[0].locked())
+            self.assertEqual(entry[1], 1)
+        self.assertNotIn(lock, _CWD_THREAD_LOCKS)
+
+    def test_session_status_reads_pending_record_once(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
+            cfg.ensure_dirs()
+            atomic_write_json(status_path(cfg, "sid"), {"session_id": "sid", "state": "pending", "route": "r"})
+            status = _SessionStatus(cfg, "sid")
+            status.update("running", exit_code=None)
+            with mock.patch("pigeon.worker.read_json", side_effect=AssertionError("re-read")):
+                status.update("succeeded", exit_code=0)
+            rec = read_json(status_path(cfg, "sid"))
+        self.assertEqual(rec["state"], "succeeded")
+        self.assertEqual(rec["route"], "r")
+        self.assertEqual(rec["exit_code"], 0)
+
+    def test_session_status_skips_unchanged_rewrite(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = PigeonConfig(cache_root=Path(tmp), namespace="ns")
+            cfg.ensure_dirs()
+            atomic_write_json(status_path(cfg, "sid"), {"session_id": "sid", "state": "pending"})
+            status = _SessionStatus(cfg, "sid")
+            status.update("running", started_at=utc_iso(), exit_code=None)
+            with mock.patch("pigeon.worker.atomic_write_json") as write_mock:
+                status.update("running", started_at=utc_iso(), exit_code=None)
+                write_mock.assert_not_called()
+                status.update("failed", finished_at=utc_iso(), exit_code=1)
+                write_mock.assert_called_once()
+                self.assertTrue(write_mock.call_args.kwargs["durable"])
+                status.update("failed", finished_at=utc_iso(), exit_code=2)
+                self.assertEqual(write_mock.call_count, 2)
+
     @staticmethod
     def _file_cfg(**kwargs) -> FileConfig:
-        base = {
-            "path": None,
-            "cache": None,
-            "namespace": None,
-            "route": None,
-            "user": None,
-            "worker_max_jobs": None,
-            "worker_poll_interval": None,
-            "worker_debug": None,
-            "worker_route": None,
-            "interactive_command": None,
-            "interactive_source_bashrc": None,
-            "remote_env": {},
-        }
-        base.update(kwargs)
-        return FileConfig(**base)
+        return replace(_EMPTY_FILE_CONFIG, **kwargs)
 
     def test_worker_runtime_resolution_from_file(self) -> None:
-        args = type("Args", (), {"route": None, "poll_interval": None, "debug": None})()
+        args = _Args(route=None, poll_interval=None, debug=None)
         cfg = self._file_cfg(route="cpu-file", worker_route="cpu-worker", worker_poll_interval=0.3, worker_debug=True)
         self.assertEqual(_resolve_worker_route(args, cfg), "cpu-worker")
         self.assertAlmostEqual(_resolve_worker_poll_interval(args, cfg), 0.3, places=6)
         self.assertTrue(_resolve_worker_debug(args, cfg))
 
     def test_worker_runtime_resolution_cli_has_priority(self) -> None:
-        args = type("Args", (), {"route": "cpu-cli", "poll_interval": 0.6, "debug": False})()
+        args = _Args(route="cpu-cli", poll_interval=0.6, debug=False)
         cfg = self._file_cfg(route="cpu-file", worker_route="cpu-worker", worker_poll_interval=0.3, worker_debug=True)
         self.assertEqual(_resolve_worker_route(args, cfg), "cpu-cli")
         self.assertAlmostEqual(_resolve_worker_poll_interval(args, cfg), 0.6, places=6)